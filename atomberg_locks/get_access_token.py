@@ -1,19 +1,21 @@
 import os
-import requests
 import azure.functions as func
 import json
+from shared_utils.http_client import vendor_request
+from shared_utils.scheduler import PRIORITY_CRITICAL
 
 def get_atomberg_connection():
     """Establishes a connection to ATOMBERG."""
     atomberg_key = os.getenv("ATOMBERG_KEY")
     atomberg_token = os.getenv("ATOMBERG_TOKEN")
-    atomberg_url=f"{os.getenv("ATOMBERG_ENDPOINT")}/get_access_token"
+    atomberg_url=f"{os.getenv('ATOMBERG_ENDPOINT')}/get_access_token"
     try:
         headers={
             "x-api-key":atomberg_key,
             "Authorization":"Bearer "+atomberg_token
         }
-        response = requests.request("GET", atomberg_url, headers=headers)
+        response = vendor_request("atomberg", "GET", atomberg_url, stage="get_access_token",
+                                  priority=PRIORITY_CRITICAL, headers=headers)
         if response.status_code==200:
             access_token=json.loads(response.text)['message']['access_token']
             return access_token
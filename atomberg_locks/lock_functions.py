@@ -1,20 +1,42 @@
 import os
-import requests
 import json
+import tempfile
+import threading
 import azure.functions as func
 import logging
-# Global variables for caching access token and lock list
-global atombergaccess_token
-global lock_lists
-atombergaccess_token = None
-lock_lists = None
-
-def get_atomberg_connection():
-    """Establishes a connection to ATOMBERG and retrieves the access token."""
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from shared_utils.http_client import vendor_request
+from shared_utils.metrics import stage_timer
+from shared_utils.scheduler import PRIORITY_BACKGROUND, PRIORITY_CRITICAL, PRIORITY_PIN
+from shared_utils.log_utils import cap
+from atomberg_locks.token_manager import AtombergTokenManager
+from atomberg_locks.lock_registry import LockRegistry
+
+@lru_cache(maxsize=4)
+def _parse_property_credentials(raw_credentials):
+    return json.loads(raw_credentials) if raw_credentials else {}
+
+def get_property_credentials(hotel_code=None):
+    """
+    Returns the ATOMBERG key, token and endpoint for a property.
+
+    Properties listed in ATOMBERG_PROPERTY_CREDENTIALS (a JSON object keyed by hotel_code with
+    "key", "token" and optionally "endpoint") use their own account; all others use
+    ATOMBERG_KEY, ATOMBERG_TOKEN and ATOMBERG_ENDPOINT.
+    """
+    overrides = _parse_property_credentials(os.getenv("ATOMBERG_PROPERTY_CREDENTIALS", "")).get(str(hotel_code), {}) \
+        if hotel_code else {}
+    return (
+        overrides.get("key") or os.getenv("ATOMBERG_KEY"),
+        overrides.get("token") or os.getenv("ATOMBERG_TOKEN"),
+        overrides.get("endpoint") or os.getenv("ATOMBERG_ENDPOINT"),
+    )
+
+def fetch_access_token(credentials=None):
+    """Requests a new access token from ATOMBERG and returns it with its lifetime in seconds."""
     logging.info("Attempting to establish ATOMBERG connection.")
-    atomberg_key = os.getenv("ATOMBERG_KEY")
-    atomberg_token = os.getenv("ATOMBERG_TOKEN")
-    atomberg_url_base = os.getenv("ATOMBERG_ENDPOINT")
+    atomberg_key, atomberg_token, atomberg_url_base = credentials or get_property_credentials()
     atomberg_url = f"{atomberg_url_base}/get_access_token"
 
     try:
@@ -22,102 +44,273 @@ def get_atomberg_connection():
             "x-api-key": atomberg_key,
             "Authorization": "Bearer " + atomberg_token
         }
-        logging.debug(f"Sending GET request to {atomberg_url} with headers: {headers}")
-        response = requests.request("GET", atomberg_url, headers=headers)
+        logging.debug("Sending GET request to %s", atomberg_url)
+        response = vendor_request("atomberg", "GET", atomberg_url, stage="get_access_token",
+                                  priority=PRIORITY_CRITICAL, headers=headers)
 
         if response.status_code == 200:
-            access_token = json.loads(response.text)['message']['access_token']
-            global atombergaccess_token
-            atombergaccess_token = access_token
+            message = json.loads(response.text)['message']
+            access_token = message['access_token']
+            lifetime = float(message.get('expires_in') or os.getenv("ATOMBERG_TOKEN_TTL_SECONDS", "3600"))
             logging.info("Access token successfully retrieved.")
-            return access_token
+            return access_token, lifetime
         else:
-            logging.error(f"Failed to retrieve access token. Status code: {response.status_code}, Response: {response.text}")
+            logging.error("Failed to retrieve access token. Status code: %s, Response: %s",
+                          response.status_code, cap(response.text))
             return None
     except Exception as e:
         logging.exception("An error occurred while retrieving the access token.")
         return None
 
-def get_device_id(room_no, access_token):
-    """Retrieves the device ID for a given room number."""
-    logging.info(f"Attempting to retrieve device ID for room number: {room_no}")
+# One token manager per ATOMBERG account; properties sharing an account share its token.
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+def get_token_manager(hotel_code=None):
+    """Returns the token manager of the ATOMBERG account a property uses."""
+    credentials = get_property_credentials(hotel_code)
+    manager = _token_managers.get(credentials)
+    if manager is None:
+        with _token_managers_lock:
+            manager = _token_managers.get(credentials)
+            if manager is None:
+                manager = _token_managers[credentials] = AtombergTokenManager(
+                    lambda: fetch_access_token(credentials),
+                    refresh_margin=int(os.getenv("ATOMBERG_TOKEN_REFRESH_MARGIN_SECONDS", "300")),
+                )
+    return manager
+
+def get_atomberg_connection(hotel_code=None):
+    """Establishes a connection to ATOMBERG and retrieves the cached or refreshed access token."""
+    return get_token_manager(hotel_code).get_token()
+
+def atomberg_request(method, path, hotel_code=None, priority=PRIORITY_PIN, **kwargs):
+    """
+    Sends an authenticated request to ATOMBERG with the property's credentials.
+
+    Lock list and PIN calls default to PIN priority, since check-ins wait on them.
+
+    A 401 response invalidates the token and the request is retried once with a fresh one.
+    Returns None if no access token could be obtained.
+    """
+    atomberg_key, _, atomberg_url_base = get_property_credentials(hotel_code)
+    atomberg_url = f"{atomberg_url_base}/{path}"
+    tokens = get_token_manager(hotel_code)
+    access_token = tokens.get_token()
+    for attempt in range(2):
+        if not access_token:
+            logging.error("Access token retrieval failed. Cannot call ATOMBERG.")
+            return None
+        headers = {
+            "x-api-key": atomberg_key,
+            "Authorization": "Bearer " + access_token
+        }
+        logging.debug("Sending %s request to %s", method, atomberg_url)
+        response = vendor_request("atomberg", method, atomberg_url, stage=path, priority=priority,
+                                  headers=headers, **kwargs)
+        if response.status_code != 401 or attempt:
+            return response
+        logging.warning(f"ATOMBERG rejected the access token for {path}. Retrying with a fresh token.")
+        tokens.invalidate(access_token)
+        access_token = tokens.get_token()
+
+def fetch_lock_list(hotel_code=None):
+    """Downloads a property's lock list from ATOMBERG; returns None on failure."""
     try:
-        atomberg_key = os.getenv("ATOMBERG_KEY")
-        atomberg_url_base = os.getenv("ATOMBERG_ENDPOINT")
-        atomberg_url = f"{atomberg_url_base}/get_list_of_locks"
-
-        if access_token:
-            headers = {
-                "x-api-key": atomberg_key,
-                "Authorization": "Bearer " + access_token
+        response = atomberg_request("GET", "get_list_of_locks", hotel_code)
+        if response is None:
+            logging.warning("Access token is None. Cannot fetch the lock list.")
+            return None
+        if response.status_code == 200:
+            lock_list = json.loads(response.text)['message']['locks_list']
+            logging.info(f"Lock list retrieved successfully for {hotel_code or 'the default property'}: {len(lock_list)} locks.")
+            return lock_list
+        logging.error("Failed to retrieve lock list. Status code: %s, Response: %s",
+                      response.status_code, cap(response.text))
+        return None
+    except Exception:
+        logging.exception(f"An error occurred while retrieving the lock list for {hotel_code}.")
+        return None
+
+lock_registry = LockRegistry(
+    fetch_lock_list,
+    ttl=float(os.getenv("LOCK_REGISTRY_TTL_SECONDS", "3600")),
+    miss_refresh_interval=float(os.getenv("LOCK_REGISTRY_MISS_REFRESH_SECONDS", "60")),
+    # Point this at shared storage (e.g. under /home) to let new instances start from it.
+    snapshot_path=os.getenv("LOCK_REGISTRY_SNAPSHOT_PATH",
+                            os.path.join(tempfile.gettempdir(), "atomberg_lock_registry.json")) or None,
+)
+
+def lock_list_account(hotel_code=None):
+    """
+    Returns the lock registry key of the ATOMBERG account that serves a property.
+
+    Properties with their own ATOMBERG_PROPERTY_CREDENTIALS are keyed by hotel_code; all
+    others share the default account's lock list, keyed None, so warming it once covers them.
+    """
+    if hotel_code and str(hotel_code) in _parse_property_credentials(os.getenv("ATOMBERG_PROPERTY_CREDENTIALS", "")):
+        return str(hotel_code)
+    return None
+
+def get_device_id(room_no, hotel_code=None):
+    """Retrieves the device ID for a given room number of a property."""
+    logging.debug("Attempting to retrieve device ID for room number: %s", room_no)
+    try:
+        return lock_registry.get_device_id(lock_list_account(hotel_code), room_no)
+    except Exception:
+        logging.exception("An error occurred while retrieving device ID for room number: %s", room_no)
+        return None
+
+def warm_lock_registry():
+    """Loads the lock lists of the default account and every property with its own credentials."""
+    accounts = [None] + list(_parse_property_credentials(os.getenv("ATOMBERG_PROPERTY_CREDENTIALS", "")))
+    return {str(account): lock_registry.ensure_loaded(account) for account in accounts}
+
+def generate_otp_lock(room_no, checkintime, checkouttime, hotel_code=None, priority=PRIORITY_PIN):
+    """Generates a dynamic OTP for the lock."""
+    logging.debug("Generating OTP for room number: %s", room_no)
+    try:
+        device_id = get_device_id(room_no, hotel_code)
+
+        if device_id:
+            payload = {
+                "device_id": device_id,
+                "start_time": checkintime,
+                "end_time": checkouttime
             }
-            logging.debug(f"Sending GET request to {atomberg_url} with headers: {headers}")
-            response = requests.request("GET", atomberg_url, headers=headers)
+            logging.debug("Requesting dynamic pin with payload: %s", payload)
+            response = atomberg_request("POST", "get_lock_dynamic_pin", hotel_code, priority,
+                                        data=json.dumps(payload))
 
+            if response is None:
+                return None
             if response.status_code == 200:
-                lock_list = json.loads(response.text)['message']['locks_list']
-                global lock_lists
-                lock_lists = {item["name"]: item["device_id"] for item in lock_list}
-                logging.info(f"Device list retrieved successfully. Locks: {lock_lists}")
-                return lock_lists.get(room_no, "")
+                otp = json.loads(response.text)['message']['data']
+                logging.debug("OTP successfully generated for room number: %s.", room_no)
+                return otp
             else:
-                logging.error(f"Failed to retrieve lock list. Status code: {response.status_code}, Response: {response.text}")
+                logging.error("Failed to generate OTP for room number: %s. Status code: %s, Response: %s",
+                              room_no, response.status_code, cap(response.text))
                 return None
         else:
-            logging.warning("Access token is None. Cannot fetch device ID.")
+            logging.warning("Device ID not found for room number: %s", room_no)
             return None
     except Exception as e:
-        logging.exception(f"An error occurred while retrieving device ID for room number: {room_no}")
+        logging.exception("An error occurred while generating OTP for room number: %s", room_no)
         return func.HttpResponse(f"Some Error Occurred: {e}", status_code=500)
 
-def generate_otp_lock(room_no, checkintime, checkouttime):
-    """Generates a dynamic OTP for the lock."""
-    logging.info(f"Generating OTP for room number: {room_no}")
-    try:
-        # Retrieve or use cached access token
-        global atombergaccess_token
-        if not atombergaccess_token:
-            logging.info("Access token not cached. Fetching new token.")
-            atombergaccess_token = get_atomberg_connection()
-
-        if atombergaccess_token:
-            # Retrieve or use cached lock list
-            global lock_lists
-            if not lock_lists:
-                logging.info("Lock list not cached. Fetching new list.")
-                device_id = get_device_id(room_no, atombergaccess_token)
-            else:
-                device_id = lock_lists.get(room_no, "")
-
-            if device_id:
-                atomberg_key = os.getenv("ATOMBERG_KEY")
-                atomberg_url_base = os.getenv("ATOMBERG_ENDPOINT")
-                atomberg_url = f"{atomberg_url_base}/get_lock_dynamic_pin"
-                headers = {
-                    "x-api-key": atomberg_key,
-                    "Authorization": "Bearer " + atombergaccess_token
-                }
-                payload = {
-                    "device_id": device_id,
-                    "start_time": checkintime,
-                    "end_time": checkouttime
-                }
-                logging.debug(f"Sending POST request to {atomberg_url} with headers: {headers} and payload: {payload}")
-                response = requests.request("POST", atomberg_url, headers=headers, data=json.dumps(payload))
-
-                if response.status_code == 200:
-                    otp = json.loads(response.text)['message']['data']
-                    logging.info(f"OTP successfully generated for room number: {room_no}. OTP: {otp}")
-                    return otp
-                else:
-                    logging.error(f"Failed to generate OTP. Status code: {response.status_code}, Response: {response.text}")
-                    return None
-            else:
-                logging.warning(f"Device ID not found for room number: {room_no}")
-                return None
+def generate_otp_locks(room_requests, max_workers=None, priority=PRIORITY_PIN):
+    """
+    Generates dynamic OTPs for several rooms concurrently.
+
+    Parameters:
+        room_requests (list): (room_no, checkintime, checkouttime[, hotel_code]) tuples.
+        max_workers (int): Size of the worker pool. Defaults to OTP_GENERATION_WORKERS (8).
+        priority (int): Scheduler priority of the PIN requests (see shared_utils.scheduler).
+
+    Returns:
+        list: One dict per request, in the original order, with keys room_no, otp and error.
+    """
+    room_requests = list(room_requests)
+    if not room_requests:
+        return []
+    if max_workers is None:
+        max_workers = int(os.getenv("OTP_GENERATION_WORKERS", "8"))
+    max_workers = max(1, min(max_workers, len(room_requests)))
+
+    # Warm each property's token and lock list once so the workers don't all race to fetch them.
+    for hotel_code in {room_request[3] if len(room_request) > 3 else None for room_request in room_requests}:
+        if get_atomberg_connection(hotel_code):
+            lock_registry.ensure_loaded(lock_list_account(hotel_code))
+
+    def _generate(room_request):
+        room_no = room_request[0]
+        try:
+            room_no, checkintime, checkouttime = room_request[:3]
+            hotel_code = room_request[3] if len(room_request) > 3 else None
+            otp = generate_otp_lock(room_no, checkintime, checkouttime, hotel_code, priority)
+        except Exception as e:
+            logging.exception("OTP generation raised for room number: %s", room_no)
+            return {"room_no": room_no, "otp": None, "error": str(e)}
+        if isinstance(otp, dict):
+            return {"room_no": room_no, "otp": otp, "error": None}
+        return {"room_no": room_no, "otp": None, "error": "OTP generation failed"}
+
+    logging.info(f"Generating OTPs for {len(room_requests)} rooms with {max_workers} workers.")
+    with stage_timer("otp.generate_batch", rooms=len(room_requests)) as span:
+        if max_workers == 1:
+            results = [_generate(room_request) for room_request in room_requests]
         else:
-            logging.error("Access token retrieval failed. Cannot generate OTP.")
-            return None
-    except Exception as e:
-        logging.exception(f"An error occurred while generating OTP for room number: {room_no}")
-        return func.HttpResponse(f"Some Error Occurred: {e}", status_code=500)
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="atomberg-otp") as executor:
+                results = list(executor.map(_generate, room_requests))
+        span["failed_rooms"] = sum(1 for result in results if result["error"])
+    return results
+
+def revocation_configured():
+    """Returns True if ATOMBERG_REVOKE_PIN_PATH is set, i.e. PINs can be revoked on the locks."""
+    return bool(os.getenv("ATOMBERG_REVOKE_PIN_PATH"))
+
+def revoke_otp_lock(room_no, otp, hotel_code=None, priority=PRIORITY_BACKGROUND):
+    """
+    Revokes a dynamic PIN on the room's lock.
+
+    The endpoint is ATOMBERG_REVOKE_PIN_PATH, relative to the property's ATOMBERG endpoint.
+
+    Returns:
+        str: None on success, otherwise the reason the PIN could not be revoked.
+    """
+    revoke_path = os.getenv("ATOMBERG_REVOKE_PIN_PATH")
+    if not revoke_path:
+        return "PIN revocation is not configured (ATOMBERG_REVOKE_PIN_PATH)."
+    device_id = get_device_id(room_no, hotel_code)
+    if not device_id:
+        logging.warning("Device ID not found for room number: %s", room_no)
+        return "Device ID not found"
+
+    payload = {
+        "device_id": device_id,
+        "pin": str(otp or "").rstrip("#")
+    }
+    response = atomberg_request("POST", revoke_path, hotel_code, priority, data=json.dumps(payload))
+    if response is None:
+        return "Access token retrieval failed"
+    if response.status_code != 200:
+        logging.error("Failed to revoke OTP for room number: %s. Status code: %s, Response: %s",
+                      room_no, response.status_code, cap(response.text))
+        return f"Revocation failed with status {response.status_code}"
+    return None
+
+def revoke_otp_locks(revoke_requests, max_workers=None, priority=PRIORITY_BACKGROUND):
+    """
+    Revokes dynamic PINs on several locks concurrently.
+
+    Parameters:
+        revoke_requests (list): (room_no, otp, hotel_code) tuples.
+        max_workers (int): Size of the worker pool. Defaults to OTP_GENERATION_WORKERS (8).
+        priority (int): Scheduler priority of the revocation requests.
+
+    Returns:
+        list: One dict per request, in the original order, with keys room_no and error.
+    """
+    revoke_requests = list(revoke_requests)
+    if not revoke_requests:
+        return []
+    if max_workers is None:
+        max_workers = int(os.getenv("OTP_GENERATION_WORKERS", "8"))
+    max_workers = max(1, min(max_workers, len(revoke_requests)))
+
+    def _revoke(revoke_request):
+        room_no, otp, hotel_code = revoke_request
+        try:
+            error = revoke_otp_lock(room_no, otp, hotel_code, priority)
+        except Exception as e:
+            logging.exception("OTP revocation raised for room number: %s", room_no)
+            error = str(e)
+        return {"room_no": room_no, "error": error}
+
+    logging.info(f"Revoking OTPs for {len(revoke_requests)} rooms with {max_workers} workers.")
+    with stage_timer("otp.revoke_batch", rooms=len(revoke_requests)) as span:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="atomberg-revoke") as executor:
+            results = list(executor.map(_revoke, revoke_requests))
+        span["failed_rooms"] = sum(1 for result in results if result["error"])
+    return results
@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import time
+import logging
+import tempfile
+import threading
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]")
+
+
+def normalize_room_name(room_name):
+    """Normalizes a room name for lookups, so "AV 303", "av303" and "AV-303" match."""
+    return _NON_ALPHANUMERIC.sub("", str(room_name or "").lower())
+
+
+class LockRegistry:
+    """
+    Maps (hotel_code, room name) to Atomberg device IDs.
+
+    Each property's lock list is cached for `ttl` seconds. A room missing from a fresh list
+    triggers one refresh (at most every `miss_refresh_interval` seconds per property), whose
+    result is merged into the cached list. Lists are persisted to a JSON snapshot so new
+    instances can start from it instead of downloading every property's lock list.
+    """
+
+    def __init__(self, fetch_locks, ttl=3600, miss_refresh_interval=60, snapshot_path=None):
+        """
+        Parameters:
+            fetch_locks (callable): fetch_locks(hotel_code) returns the vendor lock list
+                ([{"name": ..., "device_id": ...}]) or None on failure.
+            ttl (float): Seconds a property's lock list stays fresh.
+            miss_refresh_interval (float): Minimum seconds between refreshes caused by misses.
+            snapshot_path (str): JSON file for the snapshot; None disables persistence.
+        """
+        self._fetch_locks = fetch_locks
+        self._ttl = ttl
+        self._miss_refresh_interval = miss_refresh_interval
+        self._snapshot_path = snapshot_path
+        self._properties = {}
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_loaded = False
+
+    def get_device_id(self, hotel_code, room_name):
+        """Returns the device ID of a room, or "" if the property has no such lock."""
+        entry = self._get_entry(hotel_code)
+        room_key = normalize_room_name(room_name)
+
+        with entry["lock"]:
+            if time.time() - entry["refreshed_at"] > self._ttl:
+                self._refresh(hotel_code, entry, merge=False)
+            device_id = entry["locks"].get(room_key)
+            if device_id is None and time.time() - entry["last_miss_refresh"] > self._miss_refresh_interval:
+                logging.info(f"Room {room_name} not in the lock list of {hotel_code}. Refreshing once.")
+                entry["last_miss_refresh"] = time.time()
+                self._refresh(hotel_code, entry, merge=True)
+                device_id = entry["locks"].get(room_key)
+        return device_id or ""
+
+    def ensure_loaded(self, hotel_code):
+        """Loads a property's lock list if it is missing or stale; returns False on failure."""
+        entry = self._get_entry(hotel_code)
+        with entry["lock"]:
+            if time.time() - entry["refreshed_at"] > self._ttl:
+                return self._refresh(hotel_code, entry, merge=False)
+        return True
+
+    def stats(self):
+        """Returns the number of cached locks and the list age per property."""
+        now = time.time()
+        with self._lock:
+            return {
+                str(hotel_code): {"locks": len(entry["locks"]), "age_seconds": round(now - entry["refreshed_at"], 1)}
+                for hotel_code, entry in self._properties.items()
+            }
+
+    def _get_entry(self, hotel_code):
+        self._load_snapshot()
+        with self._lock:
+            entry = self._properties.get(hotel_code)
+            if entry is None:
+                entry = self._properties[hotel_code] = self._new_entry()
+            return entry
+
+    @staticmethod
+    def _new_entry(locks=None, refreshed_at=0.0):
+        return {"locks": locks or {}, "refreshed_at": refreshed_at, "last_miss_refresh": 0.0,
+                "lock": threading.Lock()}
+
+    def _refresh(self, hotel_code, entry, merge):
+        lock_list = self._fetch_locks(hotel_code)
+        if lock_list is None:
+            return False
+        locks = {normalize_room_name(item["name"]): item["device_id"] for item in lock_list}
+        if merge:
+            entry["locks"].update(locks)
+        else:
+            entry["locks"] = locks
+        entry["refreshed_at"] = time.time()
+        logging.info(f"Lock list for {hotel_code} refreshed with {len(locks)} locks.")
+        self._save_snapshot()
+        return True
+
+    def _load_snapshot(self):
+        if self._snapshot_loaded:
+            return
+        with self._snapshot_lock:
+            if self._snapshot_loaded:
+                return
+            self._snapshot_loaded = True
+            if not self._snapshot_path or not os.path.exists(self._snapshot_path):
+                return
+            try:
+                with open(self._snapshot_path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                logging.exception("Could not read the lock registry snapshot.")
+                return
+            with self._lock:
+                for property_snapshot in snapshot.get("properties", []):
+                    hotel_code = property_snapshot.get("hotel_code")
+                    if hotel_code not in self._properties:
+                        self._properties[hotel_code] = self._new_entry(
+                            property_snapshot.get("locks", {}), property_snapshot.get("refreshed_at", 0.0)
+                        )
+            logging.info(f"Loaded lock registry snapshot with {len(self._properties)} properties.")
+
+    def _save_snapshot(self):
+        if not self._snapshot_path:
+            return
+        with self._lock:
+            snapshot = {"properties": [
+                {"hotel_code": hotel_code, "locks": dict(entry["locks"]), "refreshed_at": entry["refreshed_at"]}
+                for hotel_code, entry in self._properties.items()
+                if entry["refreshed_at"]
+            ]}
+        with self._snapshot_lock:
+            try:
+                directory = os.path.dirname(self._snapshot_path) or "."
+                os.makedirs(directory, exist_ok=True)
+                # Write then rename, so a concurrent reader never sees a half-written file.
+                with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as temp_file:
+                    json.dump(snapshot, temp_file)
+                os.replace(temp_file.name, self._snapshot_path)
+            except OSError:
+                logging.exception("Could not write the lock registry snapshot.")
@@ -0,0 +1,83 @@
+import time
+import threading
+import logging
+
+
+class AtombergTokenManager:
+    """
+    Caches an Atomberg access token together with its lifetime.
+
+    The token is refreshed in the background once it enters the refresh margin,
+    so callers keep using the current token instead of waiting on get_access_token.
+    Only one refresh runs at a time; concurrent callers that find the token expired
+    wait for that refresh and share its result.
+    """
+
+    def __init__(self, fetch_token, refresh_margin=300):
+        """
+        Parameters:
+            fetch_token (callable): Returns (access_token, lifetime_seconds) or None on failure.
+            refresh_margin (int): Seconds before expiry at which a background refresh starts.
+        """
+        self._fetch_token = fetch_token
+        self._refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        # Guards only the background single-flight flag, so callers inside the refresh
+        # margin never wait on the fetch that holds self._lock.
+        self._background_lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        self._background_refresh = False
+
+    def get_token(self):
+        """Returns a valid access token, fetching one if none is cached or it has expired."""
+        token = self._token
+        now = time.monotonic()
+        if token and now < self._expires_at:
+            if now >= self._expires_at - self._refresh_margin:
+                self._start_background_refresh(token)
+            return token
+        return self._refresh(token)
+
+    def invalidate(self, token):
+        """Marks a token as expired, e.g. after the vendor rejected it with a 401."""
+        with self._lock:
+            if self._token == token:
+                logging.info("Atomberg access token invalidated.")
+                self._expires_at = 0.0
+
+    def _refresh(self, stale_token):
+        with self._lock:
+            # Another caller may have refreshed the token while we waited for the lock.
+            if self._token and self._token != stale_token and time.monotonic() < self._expires_at:
+                return self._token
+
+            result = self._fetch_token()
+            if not result:
+                # Keep serving a still-valid token if only the early refresh failed.
+                if self._token and time.monotonic() < self._expires_at:
+                    return self._token
+                return None
+
+            token, lifetime = result
+            self._token = token
+            self._expires_at = time.monotonic() + lifetime
+            logging.info(f"Atomberg access token refreshed, valid for {int(lifetime)} seconds.")
+            return token
+
+    def _start_background_refresh(self, stale_token):
+        with self._background_lock:
+            if self._background_refresh:
+                return
+            self._background_refresh = True
+
+        def _run():
+            try:
+                self._refresh(stale_token)
+            except Exception:
+                logging.exception("Background refresh of the Atomberg access token failed.")
+            finally:
+                with self._background_lock:
+                    self._background_refresh = False
+
+        threading.Thread(target=_run, name="atomberg-token-refresh", daemon=True).start()
@@ -0,0 +1,183 @@
+"""
+Offline benchmark for the check-in flow.
+
+Starts local stand-ins for Atomberg, WhatsApp, Fast2SMS and Azure SQL, drives
+handle_hotel_guest_otp_crud with synthetic eZee payloads and writes latency,
+throughput and vendor-call counts to a JSON file that can be diffed between runs.
+
+Usage:
+    python -m benchmarks.checkin_benchmark --rooms 1,10,50,100,500 --iterations 10 \
+        --vendor-latency-ms 80 --error-rate 0.01 --output bench_results.json
+"""
+import os
+import json
+import time
+import argparse
+import logging
+import platform
+from datetime import datetime, timezone
+from benchmarks.vendor_stubs import VendorStubServer, room_name
+from benchmarks.sql_stub import StubDatabase
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def build_payload(room_count, sequence, rooms_per_booking=5):
+    """Builds an eZee check-in payload with `room_count` rooms split across bookings."""
+    bookings = []
+    for start in range(0, room_count, rooms_per_booking):
+        rooms = range(start, min(start + rooms_per_booking, room_count))
+        bookings.append({
+            "SubBookingId": f"BENCH-{sequence}-{start // rooms_per_booking}",
+            "Start": "2030-01-10",
+            "End": "2030-01-12",
+            "ArrivalTime": "14:00:00",
+            "DepartureTime": "11:00:00",
+            "RentalInfo": [{"RoomName": room_name(index)} for index in rooms],
+        })
+    return {
+        "operation": "checkin",
+        "hotel_code": "BENCH",
+        "data": {"Reservations": {"Reservation": [{
+            "UniqueID": f"BENCH-{sequence}",
+            "Salutation": "Mr",
+            "FirstName": "Bench",
+            "LastName": f"Guest {sequence}",
+            "Mobile": "919000000000",
+            "Email": "bench@example.com",
+            "BookingTran": bookings,
+        }]}},
+    }
+
+
+def configure_environment(base_url):
+    """Points every vendor setting at the local stand-ins."""
+    os.environ.update({
+        "ATOMBERG_ENDPOINT": f"{base_url}/atomberg",
+        "ATOMBERG_KEY": "bench-key",
+        "ATOMBERG_TOKEN": "bench-token",
+        "WHATSAPP_ENDPOINT": f"{base_url}/whatsapp",
+        "WHATSAPP_API_KEY": "bench-key",
+        "SMS_ENDPOINT": f"{base_url}/sms",
+        "SMS_API_KEY": "bench-key",
+    })
+
+
+def run_scenario(room_count, iterations, stubs, database, dispatch, sequence_start):
+    """Runs one payload size and returns its latency and call-count summary."""
+    # Imported here so the modules read the stand-in environment on first import.
+    from crud_operations.hotel_guest_otp import handle_hotel_guest_otp_crud
+    from otp_notifications.outbox import dispatch_outbox
+
+    stubs.reset_counters()
+    database.reset()
+    checkin_latencies = []
+    dispatch_latencies = []
+    failures = 0
+    started = time.perf_counter()
+
+    for iteration in range(iterations):
+        payload = build_payload(room_count, sequence_start + iteration)
+        call_started = time.perf_counter()
+        response = handle_hotel_guest_otp_crud("POST", {}, payload)
+        checkin_latencies.append(time.perf_counter() - call_started)
+        if response.status_code != 200 or b"failed" in response.get_body():
+            failures += 1
+
+        if dispatch:
+            call_started = time.perf_counter()
+            while dispatch_outbox()["claimed"]:
+                pass
+            dispatch_latencies.append(time.perf_counter() - call_started)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "rooms": room_count,
+        "iterations": iterations,
+        "failed_requests": failures,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rooms_per_second": round(room_count * iterations / elapsed, 2) if elapsed else None,
+        "checkin_latency_seconds": latency_summary(checkin_latencies),
+        "vendor_calls": dict(stubs.calls),
+        "vendor_errors": dict(stubs.errors),
+        "sql_round_trips": dict(database.round_trips),
+    }
+    if dispatch:
+        summary["dispatch_latency_seconds"] = latency_summary(dispatch_latencies)
+    return summary
+
+
+def latency_summary(latencies):
+    return {
+        "p50": round(percentile(latencies, 0.50), 4) if latencies else None,
+        "p95": round(percentile(latencies, 0.95), 4) if latencies else None,
+        "p99": round(percentile(latencies, 0.99), 4) if latencies else None,
+        "max": round(max(latencies), 4) if latencies else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the hotel_guest_otp check-in flow.")
+    parser.add_argument("--rooms", default="1,10,50,100,500", help="Comma-separated room counts per payload.")
+    parser.add_argument("--iterations", type=int, default=10, help="Requests per room count.")
+    parser.add_argument("--vendor-latency-ms", type=float, default=50, help="Base latency of every vendor call.")
+    parser.add_argument("--vendor-jitter-ms", type=float, default=20, help="Random extra latency per vendor call.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of vendor calls answered with 500.")
+    parser.add_argument("--sql-latency-ms", type=float, default=5, help="Latency of every SQL round-trip.")
+    parser.add_argument("--no-dispatch", action="store_true", help="Skip draining the notification outbox.")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for latency jitter and injected errors.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    room_counts = [int(value) for value in args.rooms.split(",") if value.strip()]
+    stubs = VendorStubServer(
+        latency_ms=args.vendor_latency_ms,
+        jitter_ms=args.vendor_jitter_ms,
+        error_rate=args.error_rate,
+        lock_count=max(room_counts),
+        seed=args.seed,
+    ).start()
+    database = StubDatabase(latency_ms=args.sql_latency_ms)
+    configure_environment(stubs.base_url)
+
+    import crud_operations.hotel_guest_otp as hotel_guest_otp
+    import otp_notifications.outbox as outbox
+    hotel_guest_otp.get_db_connection = database.connect
+    outbox.get_db_connection = database.connect
+
+    try:
+        # One small request first so token and lock-list fetches are not billed to a scenario.
+        run_scenario(1, 1, stubs, database, dispatch=False, sequence_start=-1)
+        results = []
+        for index, room_count in enumerate(room_counts):
+            result = run_scenario(room_count, args.iterations, stubs, database,
+                                  dispatch=not args.no_dispatch, sequence_start=index * args.iterations)
+            results.append(result)
+            latency = result["checkin_latency_seconds"]
+            print(f"{room_count:>4} rooms: p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  "
+                  f"{result['throughput_rooms_per_second']} rooms/s  vendor calls {sum(result['vendor_calls'].values())}")
+    finally:
+        stubs.stop()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
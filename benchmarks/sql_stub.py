@@ -0,0 +1,130 @@
+import time
+import threading
+from collections import Counter
+
+
+class StubDatabase:
+    """
+    In-memory stand-in for the Azure SQL database used by the check-in flow.
+
+    It does not parse SQL; it recognises the statements the application issues, keeps the
+    inserted OTP records and outbox rows, and sleeps `latency_ms` per round-trip.
+    """
+
+    def __init__(self, latency_ms=5):
+        self.latency_ms = latency_ms
+        self.otp_records = []
+        self.outbox = []
+        self.round_trips = Counter()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        return StubConnection(self)
+
+    def reset(self):
+        with self._lock:
+            self.otp_records.clear()
+            self.outbox.clear()
+            self.round_trips.clear()
+
+    def round_trip(self, kind):
+        with self._lock:
+            self.round_trips[kind] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+
+class StubCursor:
+    def __init__(self, database):
+        self._database = database
+        self._rows = []
+        self.description = None
+        self.fast_executemany = False
+
+    def execute(self, query, params=()):
+        statement = " ".join(query.split()).upper()
+        self._rows = []
+        self.description = None
+
+        if statement.startswith("SELECT COUNT(*)"):
+            self._database.round_trip("select")
+            self._rows = [(len(self._database.otp_records),)]
+        elif statement.startswith("UPDATE TOP") and "NOTIFICATION_OUTBOX" in statement:
+            self._database.round_trip("outbox_claim")
+            batch_size = params[0]
+            with self._database._lock:
+                claimed = [row for row in self._database.outbox if row["status"] == "Pending"][:batch_size]
+                for row in claimed:
+                    row["status"] = "Claimed"
+                    row["attempts"] += 1
+            self._rows = [(row["id"], row["channel"], row["payload"], row["attempts"]) for row in claimed]
+        elif statement.startswith("SELECT"):
+            # Lookups (idempotency, GET pages) find nothing in the stand-in.
+            self._database.round_trip("select")
+            self.description = [("id",), ("check_in_date_time",)]
+        else:
+            self._database.round_trip("execute")
+        return self
+
+    def executemany(self, query, rows):
+        statement = " ".join(query.split()).upper()
+        rows = list(rows)
+        self._database.round_trip("executemany")
+        with self._database._lock:
+            if statement.startswith("INSERT INTO DBO.HOTEL_GUEST_OTP_RECORD"):
+                self._database.otp_records.extend(rows)
+            elif statement.startswith("INSERT INTO DBO.HOTEL_GUEST_NOTIFICATION_OUTBOX"):
+                for hotel_code, channel, payload in rows:
+                    self._database.outbox.append({
+                        "id": len(self._database.outbox) + 1,
+                        "channel": channel,
+                        "payload": payload,
+                        "status": "Pending",
+                        "attempts": 0,
+                    })
+            elif "SET STATUS = 'DELIVERED'" in statement:
+                delivered = {row[0] for row in rows}
+                for row in self._database.outbox:
+                    if row["id"] in delivered:
+                        row["status"] = "Delivered"
+            elif statement.startswith("UPDATE DBO.HOTEL_GUEST_NOTIFICATION_OUTBOX"):
+                updates = {row[-1]: row[0] for row in rows}
+                for row in self._database.outbox:
+                    if row["id"] in updates:
+                        row["status"] = updates[row["id"]]
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class StubConnection:
+    def __init__(self, database):
+        self._database = database
+
+    def cursor(self):
+        return StubCursor(self._database)
+
+    def commit(self):
+        self._database.round_trip("commit")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        return False
@@ -0,0 +1,126 @@
+import json
+import time
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class VendorStubServer:
+    """
+    Local stand-in for the Atomberg, WhatsApp and Fast2SMS endpoints.
+
+    Every path answers like the real vendor after `latency_ms` (plus up to `jitter_ms`),
+    and fails with a 500 for roughly `error_rate` of the calls. Calls are counted per path.
+
+    Paths:
+        /atomberg/get_access_token, /atomberg/get_list_of_locks,
+        /atomberg/get_lock_dynamic_pin, /whatsapp, /sms
+    """
+
+    def __init__(self, latency_ms=50, jitter_ms=20, error_rate=0.0, lock_count=500, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.lock_names = [room_name(index) for index in range(lock_count)]
+        self.calls = Counter()
+        self.errors = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="vendor-stubs", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def _should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _delay(self):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms)
+        time.sleep((self.latency_ms + jitter) / 1000)
+
+    def _respond(self, path, body):
+        """Returns (status_code, response dict) for a vendor path."""
+        if path.endswith("/get_access_token"):
+            return 200, {"message": {"access_token": "stub-access-token", "expires_in": 3600}}
+        if path.endswith("/get_list_of_locks"):
+            locks = [{"name": name, "device_id": f"device-{index}"} for index, name in enumerate(self.lock_names)]
+            return 200, {"message": {"locks_list": locks}}
+        if path.endswith("/get_lock_dynamic_pin"):
+            with self._lock:
+                otp = self._random.randint(100000, 999999)
+            return 200, {"message": {"data": {
+                "otp": otp,
+                "validStartTime": body.get("start_time"),
+                "validEndTime": body.get("end_time"),
+            }}}
+        if path.endswith("/whatsapp"):
+            return 201, {"result": "queued"}
+        if path.endswith("/sms"):
+            return 200, {"return": True, "request_id": "stub-request", "message": ["SMS sent successfully."]}
+        return 404, {"error": "unknown path"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                except ValueError:
+                    body = {}
+
+                with stub._lock:
+                    stub.calls[self.path] += 1
+                stub._delay()
+                if stub._should_fail():
+                    with stub._lock:
+                        stub.errors[self.path] += 1
+                    status, payload = 500, {"error": "injected failure"}
+                else:
+                    status, payload = stub._respond(self.path, body)
+
+                encoded = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                try:
+                    self.end_headers()
+                    self.wfile.write(encoded)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up on this call (timeout or a hedged duplicate).
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def room_name(index):
+    """Room naming shared by the stub lock list and the synthetic payloads."""
+    return f"BR {100 + index}"
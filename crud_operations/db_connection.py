@@ -1,7 +1,227 @@
 import pyodbc
 import os
+import time
+import logging
+import threading
+from collections import deque
+
+# SQLSTATE classes pyodbc raises when the link to Azure SQL itself is the problem.
+TRANSIENT_SQLSTATE_PREFIXES = ("08", "HYT")
+
+
+def _is_transient(error):
+    """Returns True if a pyodbc error looks like a dropped or timed-out connection."""
+    sqlstate = str(error.args[0]) if error.args else ""
+    return isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError)) or \
+        sqlstate.startswith(TRANSIENT_SQLSTATE_PREFIXES)
+
+
+class PooledConnection:
+    """
+    A pyodbc connection checked out of the pool.
+
+    Behaves like the wrapped connection. Used as a context manager it commits on success,
+    rolls back on error and then returns the connection to the pool instead of closing it.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        broken = exc_type is not None and issubclass(exc_type, pyodbc.Error) and _is_transient(exc_value)
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        except pyodbc.Error:
+            logging.exception("Failed to finish the transaction on a pooled connection.")
+            broken = True
+            if exc_type is None:
+                self._release(broken)
+                raise
+        self._release(broken)
+        return False
+
+    def close(self):
+        """Returns the connection to the pool."""
+        self._release(False)
+
+    def _release(self, broken):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn, broken)
+
+
+class ConnectionPool:
+    """
+    A bounded pool of Azure SQL connections kept alive across warm invocations.
+
+    Idle connections are validated on checkout when they have been idle for longer than
+    validate_after seconds, and closed once idle for longer than idle_timeout seconds.
+    New connections are retried with backoff when the login fails transiently.
+    """
+
+    def __init__(self, connection_string, max_size=5, checkout_timeout=30, idle_timeout=300,
+                 validate_after=30, connect_retries=3):
+        self._connection_string = connection_string
+        self._max_size = max_size
+        self._checkout_timeout = checkout_timeout
+        self._idle_timeout = idle_timeout
+        self._validate_after = validate_after
+        self._connect_retries = connect_retries
+        self._idle = deque()
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "validation_failures": 0,
+            "evicted_idle": 0,
+            "discarded": 0,
+            "connect_retries": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def acquire(self):
+        """Checks a connection out of the pool, opening a new one if the pool is not full."""
+        deadline = time.monotonic() + self._checkout_timeout
+        with self._condition:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self._max_size:
+                    conn, idle_since = None, None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No SQL connection available within {self._checkout_timeout} seconds.")
+                wait_started = time.monotonic()
+                self._stats["waits"] += 1
+                self._condition.wait(remaining)
+                self._stats["wait_seconds"] += time.monotonic() - wait_started
+
+        try:
+            if conn is not None and not self._validate(conn, idle_since):
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            else:
+                self._count("reused")
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        return PooledConnection(self, conn)
+
+    def release(self, conn, broken=False):
+        """Returns a connection to the pool, closing it instead if it is broken."""
+        with self._condition:
+            self._in_use -= 1
+            if broken:
+                self._stats["discarded"] += 1
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def stats(self):
+        """Returns a snapshot of pool sizing and usage counters."""
+        with self._condition:
+            return dict(
+                self._stats,
+                max_size=self._max_size,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                wait_seconds=round(self._stats["wait_seconds"], 3),
+            )
+
+    def _count(self, name):
+        with self._condition:
+            self._stats[name] += 1
+
+    def _evict_idle(self):
+        # The deque is ordered oldest first, so stale connections sit at the left end.
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self._idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._stats["evicted_idle"] += 1
+            self._close(conn)
+
+    def _validate(self, conn, idle_since):
+        if time.monotonic() - idle_since < self._validate_after:
+            return True
+        try:
+            conn.cursor().execute("SELECT 1").fetchone()
+            return True
+        except pyodbc.Error:
+            logging.warning("Discarding pooled SQL connection that failed validation.")
+            self._count("validation_failures")
+            self._close(conn)
+            return False
+
+    def _connect(self):
+        for attempt in range(self._connect_retries + 1):
+            try:
+                conn = pyodbc.connect(self._connection_string)
+                self._count("created")
+                return conn
+            except pyodbc.Error as e:
+                if attempt == self._connect_retries or not _is_transient(e):
+                    raise
+                delay = 0.5 * 2 ** attempt
+                logging.warning(f"Transient SQL connection failure, retrying in {delay} seconds: {e}")
+                self._count("connect_retries")
+                time.sleep(delay)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.getenv("SQL_CONNECTION_STRING"),
+                    max_size=int(os.getenv("SQL_POOL_SIZE", "5")),
+                    checkout_timeout=float(os.getenv("SQL_POOL_CHECKOUT_TIMEOUT_SECONDS", "30")),
+                    idle_timeout=float(os.getenv("SQL_POOL_IDLE_TIMEOUT_SECONDS", "300")),
+                    validate_after=float(os.getenv("SQL_POOL_VALIDATE_AFTER_SECONDS", "30")),
+                    connect_retries=int(os.getenv("SQL_CONNECT_RETRIES", "3")),
+                )
+    return _pool
+
 
 def get_db_connection():
-    """Establishes a connection to Azure SQL."""
-    connection_string = os.getenv("SQL_CONNECTION_STRING")
-    return pyodbc.connect(connection_string)
+    """Checks out a pooled connection to Azure SQL."""
+    return get_db_pool().acquire()
+
+
+def get_db_pool_stats():
+    """Returns the connection pool statistics."""
+    return get_db_pool().stats()
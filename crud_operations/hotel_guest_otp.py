@@ -1,173 +1,725 @@
 import logging
+import os
 import azure.functions as func
 from datetime import datetime,timedelta
-import pytz
 import json
+import base64
 from crud_operations.db_connection import get_db_connection
-from atomberg_locks.lock_functions import generate_otp_lock
-from otp_notifications.sendnotifications import send_whatsapp_notification, send_sms_notification
+from shared_utils.metrics import stage_timer
+from shared_utils.scheduler import PRIORITY_PIN
+from shared_utils.log_utils import cap
+from shared_utils.time_utils import pms_time_to_epoch, epoch_to_sql_datetime, sql_datetime_to_display, convert_otp_windows
+from crud_operations.idempotency import (
+    INACTIVE_OTP_STATUSES, OTP_STATUS_REVOCATION_PENDING, find_existing_otp_records, forget_otp_records, item_idempotency_key,
+    otp_idempotency_key, remember_otp_records,
+)
+from crud_operations.response_cache import (
+    etag_matches, get_response_cache, invalidate_hotel_responses, normalize_cache_key,
+)
+from atomberg_locks.lock_functions import generate_otp_locks, revocation_configured, revoke_otp_locks
+from otp_notifications.outbox import enqueue_notifications
 
 
 def formatdatetime(datetime_str):
     """Formats a datetime string to the desired format."""
-    return datetime.strptime(datetime_str[:19], "%Y-%m-%dT%H:%M:%S")\
-        .replace(tzinfo=pytz.UTC)\
-        .astimezone(pytz.timezone("Asia/Kolkata"))\
-        .strftime("%d %b %Y, %I:%M %p")\
-        .replace("pm", "p.m.").replace("am", "a.m.")
+    return sql_datetime_to_display(datetime_str[:19])
 
 
-def call_send_notifications(data):
-    """Send notifications via WhatsApp and SMS."""
-    for item in data:
-        send_whatsapp_notification(json.dumps(item))
-        send_sms_notification(json.dumps(item))
-
 def time_to_epoch(date_str, time_str, operation="default"):
     """
-    Converts a date and time string to an epoch timestamp with an optional operation to add or subtract 1 hour.
+    Converts a date and time string to an epoch timestamp, shifted for the check-in or check-out window.
     
     Parameters:
         date_str (str): The input date as a string in the format 'YYYY-MM-DD'.
         time_str (str): The input time as a string in the format 'HH:MM:SS'.
-        operation (str): The operation to perform - 'add', 'subtract', or 'default'. Default is 'default'.
+        operation (str): The window to apply - 'checkin', 'checkout', or 'default'. Default is 'default'.
     
     Returns:
         int: The epoch timestamp of the modified (or unmodified) date and time.
     """
     try:
-        # Combine the date and time strings into a single datetime object
-        combined_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
-        logging.info(f"Combined datetime string: {combined_datetime}")
-
-        # Add or subtract 1 hour based on the operation
-        if operation == "checkout":
-            combined_datetime -= timedelta(hours=5)
-        elif operation == "checkin":
-            combined_datetime -= timedelta(hours=6)
-        elif operation != "default":
-            raise ValueError("Invalid operation. Use 'add', 'subtract', or 'default'.")
-
-        # Convert to epoch timestamp
-        epoch_time = int(combined_datetime.timestamp())
-        return epoch_time
+        return pms_time_to_epoch(date_str, time_str, operation)
     except Exception as e:
         logging.error(f"Error in time_to_epoch: {e}")
         raise
 
 def extract_columns(data):
-    """Extracts columns from the provided data."""
+    """
+    Yields one compact row per room while walking
+    data.Reservations.Reservation[].BookingTran[].RentalInfo[].
+
+    Rows that cannot be processed are yielded with an "error" key instead of aborting the
+    whole payload, so the caller can report them per room.
+    """
     logging.info("Extracting columns from payload.")
+    hotel_code = data.get("hotel_code")
+    reservations = data.get("data", {}).get("Reservations", {}).get("Reservation", [])
+    row_count = 0
+
+    for reservation in reservations:
+        guest_name = " ".join(filter(None, [reservation.get("Salutation"), reservation.get("FirstName"), reservation.get("LastName")]))
+        guest_mobile_number = reservation.get("Mobile")
+
+        # Validate and trim mobile number if necessary
+        if guest_mobile_number and len(guest_mobile_number) > 10:
+            guest_mobile_number = guest_mobile_number[-10:]  # Keep only the last 10 digits
+            logging.warning("Trimmed mobile number to its last 10 digits.")
+
+        guest_email = reservation.get("Email")
+        booking_id = reservation.get("UniqueID")
+
+        for booking_tran in reservation.get("BookingTran", []):
+            reservation_number = booking_tran.get("SubBookingId")
+            rentals = booking_tran.get("RentalInfo", [])
+
+            try:
+                check_in_date_time = time_to_epoch(booking_tran.get("Start"), booking_tran.get("ArrivalTime", "00:00:00"), "checkin")
+                check_out_date_time = time_to_epoch(booking_tran.get("End"), booking_tran.get("DepartureTime", "00:00:00"), "checkout")
+                window_error = None
+            except Exception as e:
+                window_error = f"Invalid check-in/check-out time: {e}"
+
+            for rental in rentals:
+                room_no = rental.get("RoomName")
+                row_count += 1
+                error = window_error or (None if room_no else "Missing RoomName")
+                if error:
+                    logging.error("Skipping reservation %s, room %s: %s", reservation_number, room_no, error)
+                    yield {"reservation_number": reservation_number, "room_no": room_no, "error": error}
+                    continue
+
+                yield {
+                    "hotel_code": hotel_code,
+                    "guest_name": guest_name,
+                    "room_no": room_no,
+                    "room_name": room_no,
+                    "reservation_number": reservation_number,
+                    "booking_id": booking_id or reservation_number,
+                    "guest_mobile_number": guest_mobile_number,
+                    "guest_email": guest_email,
+                    "check_in_date_time": check_in_date_time,
+                    "check_out_date_time": check_out_date_time
+                }
+
+    logging.info(f"Extracted {row_count} rooms from payload.")
+
+
+def iter_chunks(rows, chunk_size):
+    """Groups an iterable into lists of at most chunk_size items."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_otp_record_filters(params):
+    """
+    Builds the WHERE clause shared by the hotel_guest_otp_record queries.
+
+    Parameters:
+        params (dict): Query parameters (hotel_code, reservation_number, guest_mobile_number,
+            check_in_date_time as 'YYYY-MM-DD', and the inclusive range check_in_from and
+            check_in_to, also as 'YYYY-MM-DD').
+
+    Returns:
+        tuple: The WHERE clause (without the keyword) and its parameter list.
+    """
+    clauses = ["1=1"]
+    params_list = []
+
+    for column in ("hotel_code", "reservation_number", "guest_mobile_number"):
+        value = params.get(column)
+        if value:
+            clauses.append(f"{column} = ?")
+            params_list.append(value)
+
+    check_in_date = params.get("check_in_date_time")  # Specific date (YYYY-MM-DD)
+    if check_in_date:
+        # A half-open range instead of CAST(... AS DATE) keeps the predicate sargable.
+        day_start = datetime.strptime(check_in_date[:10], "%Y-%m-%d")
+        clauses.append("check_in_date_time >= ? AND check_in_date_time < ?")
+        params_list.extend([day_start, day_start + timedelta(days=1)])
+
+    check_in_from = params.get("check_in_from")
+    if check_in_from:
+        clauses.append("check_in_date_time >= ?")
+        params_list.append(datetime.strptime(check_in_from[:10], "%Y-%m-%d"))
+
+    check_in_to = params.get("check_in_to")
+    if check_in_to:
+        clauses.append("check_in_date_time < ?")
+        params_list.append(datetime.strptime(check_in_to[:10], "%Y-%m-%d") + timedelta(days=1))
+
+    return " AND ".join(clauses), params_list
+
+
+def encode_page_cursor(check_in_date_time, record_id):
+    """Encodes the keyset position of a row as an opaque cursor token."""
+    position = json.dumps([check_in_date_time.isoformat(), record_id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_page_cursor(token):
+    """Decodes a cursor token produced by encode_page_cursor into (check_in_date_time, id)."""
     try:
-        extracted_data = []
-        hotel_code = data.get("hotel_code")
-        reservations = data.get("data", {}).get("Reservations", {}).get("Reservation", [])
-
-        for reservation in reservations:
-            for booking_tran in reservation.get("BookingTran", []):
-                guest_name = " ".join(filter(None, [reservation.get("Salutation"), reservation.get("FirstName"), reservation.get("LastName")]))
-                guest_mobile_number = reservation.get("Mobile")
-
-                # Validate and trim mobile number if necessary
-                if guest_mobile_number and len(guest_mobile_number) > 10:
-                    guest_mobile_number = guest_mobile_number[-10:]  # Keep only the last 10 digits
-                    logging.warning(f"Trimmed mobile number to: {guest_mobile_number}")
-
-                guest_email = reservation.get("Email")
-                reservation_number = booking_tran.get("SubBookingId")
-
-                check_in_date = booking_tran.get("Start")
-                arrival_time = booking_tran.get("ArrivalTime", "00:00:00")
-                check_out_date = booking_tran.get("End")
-                departure_time = booking_tran.get("DepartureTime", "00:00:00")
-
-                check_in_date_time = time_to_epoch(check_in_date, arrival_time,"checkin")
-                check_out_date_time = time_to_epoch(check_out_date, departure_time,"checkout") 
-                for rental in booking_tran.get("RentalInfo", []):
-                    room_no = rental.get("RoomName")
-                    room_name = rental.get("RoomName")
-
-                    extracted_data.append({
-                        "hotel_code": hotel_code,
-                        "guest_name": guest_name,
-                        "room_no": room_no,
-                        "room_name": room_name,
-                        "reservation_number": reservation_number,
-                        "guest_mobile_number": guest_mobile_number,
-                        "guest_email": guest_email,
-                        "check_in_date_time": check_in_date_time,
-                        "check_out_date_time": check_out_date_time
-                    })
-        logging.info(f"Extracted data: {extracted_data}")
-        return extracted_data
-    except Exception as e:
-        logging.error(f"Error extracting columns: {str(e)}", exc_info=True)
-        raise
+        check_in_date_time, record_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(check_in_date_time), record_id
+    except Exception:
+        raise ValueError("Invalid cursor token.")
+
+
+# Columns the GET and export routes may return. The OTP itself and guest PII are only read
+# when a caller names them in fields=.
+OTP_RECORD_FIELDS = (
+    "id", "hotel_code", "reservation_number", "room_no", "room_name", "guest_name",
+    "guest_mobile_number", "guest_email", "check_in_date_time", "check_out_date_time",
+    "generated_otp", "otp_start_date_time", "otp_end_date_time", "otp_status",
+)
+SENSITIVE_OTP_RECORD_FIELDS = ("generated_otp", "guest_name", "guest_mobile_number", "guest_email")
+DEFAULT_OTP_RECORD_FIELDS = tuple(field for field in OTP_RECORD_FIELDS if field not in SENSITIVE_OTP_RECORD_FIELDS)
+KEYSET_FIELDS = ("check_in_date_time", "id")
+DISPLAY_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_fields(params):
+    """
+    Returns the columns requested with fields= (comma separated), checked against the allowlist.
 
+    Raises ValueError for unknown columns. Without fields=, the non-sensitive columns are used.
+    """
+    requested = params.get("fields")
+    if not requested:
+        return list(DEFAULT_OTP_RECORD_FIELDS)
+    fields = []
+    for field in requested.split(","):
+        field = field.strip().lower()
+        if not field or field in fields:
+            continue
+        if field not in OTP_RECORD_FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        fields.append(field)
+    if not fields:
+        raise ValueError("No fields requested.")
+    return fields
+
+
+def build_select_list(fields):
+    """Builds the SELECT list for the requested fields plus the keyset columns paging needs."""
+    return ", ".join(fields + [field for field in KEYSET_FIELDS if field not in fields])
+
+
+def _format_if_datetime(value):
+    return value.strftime(DISPLAY_DATETIME_FORMAT) if isinstance(value, datetime) else value
+
+
+def _column_converter(description):
+    """Picks the converter for one column from its cursor.description entry (None if none is needed)."""
+    type_code = description[1] if len(description) > 1 else None
+    if type_code is None:
+        return _format_if_datetime
+    if isinstance(type_code, type) and issubclass(type_code, datetime):
+        return lambda value: value.strftime(DISPLAY_DATETIME_FORMAT)
+    return None
+
+
+def build_row_serializer(description, fields):
+    """
+    Builds a function that turns a result row into a JSON-ready dict of the requested fields.
 
-def handle_hotel_guest_otp_crud(method, params, body):
-    """Handles CRUD operations for hotel guest OTP."""
-    logging.info(f"Handling request with method: {method}")
+    Converters are chosen once per column from cursor.description, so rows are serialized
+    without type-checking every value.
+    """
+    positions = {column[0]: position for position, column in enumerate(description)}
+    plan = [(field, positions[field], _column_converter(description[positions[field]])) for field in fields]
+
+    def serialize(row):
+        record = {}
+        for field, position, convert in plan:
+            value = row[position]
+            record[field] = value if convert is None or value is None else convert(value)
+        return record
+
+    return serialize
+
+
+OTP_STATUS_GENERATED = "OTP Generated"
+OTP_STATUS_PREGENERATED = "Pre-generated"
+
+INSERT_OTP_RECORD_QUERY = """INSERT INTO dbo.hotel_guest_otp_record (
+    hotel_code,
+    guest_name,
+    guest_mobile_number,
+    guest_email,
+    check_in_date_time,
+    check_out_date_time,
+    generated_otp,
+    otp_start_date_time,
+    otp_end_date_time,
+    room_no,
+    room_name,
+    reservation_number,
+    otp_status
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def insert_otp_records(cursor, otp_records, batch_size=None):
+    """
+    Inserts OTP records with parameter-array batches instead of one round-trip per row.
 
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
+    Parameters:
+        cursor: An open pyodbc cursor; the caller owns the transaction.
+        otp_records (list): Tuples in INSERT_OTP_RECORD_QUERY column order.
+        batch_size (int): Rows sent per executemany call. Defaults to OTP_INSERT_BATCH_SIZE (500).
+    """
+    if not otp_records:
+        return
+    if batch_size is None:
+        batch_size = int(os.getenv("OTP_INSERT_BATCH_SIZE", "500"))
+    batch_size = max(1, batch_size)
+
+    cursor.fast_executemany = True
+    with stage_timer("sql.insert_otp_records", rows=len(otp_records)):
+        for start in range(0, len(otp_records), batch_size):
+            cursor.executemany(INSERT_OTP_RECORD_QUERY, otp_records[start:start + batch_size])
+    logging.info(f"Inserted {len(otp_records)} OTP records in batches of {batch_size}.")
+
+
+def build_notification(item, generated_otp, otp_start_display, otp_end_display):
+    """Builds the WhatsApp/SMS notification payload for one room."""
+    return {
+        "phoneNumber": item.get("guest_mobile_number"),
+        "bodyValues": [
+            item.get("guest_name", ""),
+            item.get("reservation_number", ""),
+            item.get("room_no"),
+            generated_otp,
+            otp_start_display,
+            otp_end_display,
+        ],
+        "bookingId": item.get("booking_id"),
+    }
+
+
+def generate_otp_records(items, otp_status=OTP_STATUS_GENERATED, priority=PRIORITY_PIN):
+    """
+    Generates lock PINs for rows from extract_columns and builds their records.
 
-        if method == "GET":
-            reservation_number = params.get("reservation_number")
-            guest_mobile_number = params.get("guest_mobile_number")
-            check_in_date_time = params.get("check_in_date_time")  # Specific date (YYYY-MM-DD)
-            hotel_code=params.get("hotel_code")
+    priority is the scheduler priority of the PIN requests (see shared_utils.scheduler).
 
-            query = "SELECT * FROM hotel_guest_otp_record WHERE 1=1"
-            params_list = []
+    Returns:
+        tuple: Rooms whose OTP could not be generated, insert tuples in
+        INSERT_OTP_RECORD_QUERY order, notification payloads, and the new records keyed by
+        idempotency key.
+    """
+    notification_data = []
+    otp_records = []
+    new_otp_records = {}
+
+    logging.info("Generating OTPs for %s rooms.", len(items))
+    otp_results = generate_otp_locks(
+        [(item.get("room_no"), item.get("check_in_date_time"), item.get("check_out_date_time"), item.get("hotel_code"))
+         for item in items],
+        priority=priority,
+    )
+    failed_rooms = [result["room_no"] for result in otp_results if result["error"]]
+    if failed_rooms:
+        logging.error("OTP generation failed for %s rooms: %s", len(failed_rooms), cap(failed_rooms))
+
+    generated = [(item, result["otp"]) for item, result in zip(items, otp_results) if result["otp"]]
+    otp_windows = convert_otp_windows([otp_object for _, otp_object in generated])
+
+    for (item, generated_otp_object), otp_window in zip(generated, otp_windows):
+        otp_start_date_time, otp_end_date_time, otp_start_display, otp_end_display = otp_window
+        generated_otp = str(int(generated_otp_object["otp"]))+"#"
+
+        notification_data.append(build_notification(item, generated_otp, otp_start_display, otp_end_display))
+        new_otp_records[item_idempotency_key(item)] = {
+            "generated_otp": generated_otp,
+            "otp_start_date_time": otp_start_date_time,
+            "otp_end_date_time": otp_end_date_time,
+            "otp_status": otp_status,
+        }
+        otp_records.append((
+            item.get("hotel_code"),
+            item.get("guest_name", ""),
+            item.get("guest_mobile_number"),
+            item.get("guest_email"),
+            epoch_to_sql_datetime(item.get("check_in_date_time")),
+            epoch_to_sql_datetime(item.get("check_out_date_time")),
+            generated_otp,
+            otp_start_date_time,
+            otp_end_date_time,
+            item.get("room_no"),
+            item.get("room_name"),
+            item.get("reservation_number", ""),
+            otp_status,
+        ))
+
+    return failed_rooms, otp_records, notification_data, new_otp_records
+
+
+def activate_pregenerated_otps(cursor, pregenerated):
+    """
+    Switches pre-generated OTP records to 'OTP Generated' in one set-based update.
+
+    Only records the UPDATE actually changed get a notification, so a record another
+    instance or a concurrent retry already activated is not announced twice.
+
+    Parameters:
+        pregenerated (list): (item, stored record) pairs.
+
+    Returns:
+        tuple: Notification payloads and the updated records keyed by idempotency key.
+    """
+    notification_data = []
+    updated_records = {}
+    if not pregenerated:
+        return notification_data, updated_records
+
+    candidates = {item_idempotency_key(item): (item, record) for item, record in pregenerated}
+    activated = update_otp_statuses(cursor, list(candidates), OTP_STATUS_GENERATED, PREGENERATED_STATUS_CONDITION)
+    for row in activated:
+        key = otp_idempotency_key(*row[:5])
+        if key not in candidates or key in updated_records:
+            continue
+        item, record = candidates[key]
+        notification_data.append(build_notification(
+            item,
+            record["generated_otp"],
+            sql_datetime_to_display(record["otp_start_date_time"]),
+            sql_datetime_to_display(record["otp_end_date_time"]),
+        ))
+        updated_records[key] = dict(record, otp_status=OTP_STATUS_GENERATED)
+    # Whatever the cache said, these were no longer pre-generated in the database.
+    forget_otp_records([key for key in candidates if key not in updated_records])
+    logging.info(f"Activated {len(updated_records)} of {len(candidates)} pre-generated OTPs.")
+    return notification_data, updated_records
+
+
+def process_checkin_rows(cursor, items, hotel_code=None):
+    """
+    Generates, stores and queues notifications for one chunk of check-in rows.
 
-            if hotel_code:
-                query += " AND hotel_code = ?"
-                params_list.append(hotel_code)
-            if reservation_number:
-                query += " AND reservation_number = ?"
-                params_list.append(reservation_number)
+    Returns:
+        tuple: Rooms whose OTP could not be generated, and the new or updated records keyed
+        by idempotency key (to be remembered once the transaction commits).
+    """
+    # PMS retries of the same check-in reuse the stored OTPs and skip every vendor call;
+    # OTPs pre-generated for upcoming arrivals only need activating and sending.
+    with stage_timer("sql.idempotency_lookup", rooms=len(items)):
+        existing_records = find_existing_otp_records(cursor, items)
+    pregenerated = []
+    if existing_records:
+        room_count = len(items)
+        remaining = []
+        for item in items:
+            record = existing_records.get(item_idempotency_key(item))
+            if record is None:
+                remaining.append(item)
+            elif record.get("otp_status") == OTP_STATUS_PREGENERATED:
+                pregenerated.append((item, record))
+        items = remaining
+        logging.info(f"Reusing stored OTPs for {room_count - len(items)} rooms ({len(pregenerated)} pre-generated).")
+
+    notification_data, new_otp_records = activate_pregenerated_otps(cursor, pregenerated)
+    failed_rooms = []
+    if items:
+        failed_rooms, otp_records, generated_notifications, generated_records = generate_otp_records(items)
+        insert_otp_records(cursor, otp_records)
+        notification_data.extend(generated_notifications)
+        new_otp_records.update(generated_records)
+
+    # Notifications are delivered by the outbox dispatcher once this transaction commits.
+    with stage_timer("sql.enqueue_notifications", notifications=len(notification_data)):
+        enqueue_notifications(cursor, notification_data, hotel_code)
+    return failed_rooms, new_otp_records
+
+
+OTP_STATUS_REVOKED = "Revoked"
+
+# Keys are bulk-loaded into a session temp table, so one joined UPDATE changes every matching
+# record however many rooms the batch names. A NULL room or stay window matches any.
+CREATE_STATUS_KEYS_QUERY = """IF OBJECT_ID('tempdb..#otp_status_keys') IS NOT NULL DROP TABLE #otp_status_keys;
+CREATE TABLE #otp_status_keys (
+    hotel_code NVARCHAR(255) NOT NULL,
+    reservation_number NVARCHAR(255) NOT NULL,
+    room_no NVARCHAR(255) NULL,
+    check_in_date_time DATETIME2(0) NULL,
+    check_out_date_time DATETIME2(0) NULL
+)"""
+
+INSERT_STATUS_KEY_QUERY = """INSERT INTO #otp_status_keys (
+    hotel_code, reservation_number, room_no, check_in_date_time, check_out_date_time
+)
+VALUES (?, ?, ?, ?, ?)"""
+
+UPDATE_STATUS_QUERY = """UPDATE r
+SET otp_status = ?
+OUTPUT inserted.hotel_code, inserted.reservation_number, inserted.room_no, inserted.check_in_date_time,
+    inserted.check_out_date_time, inserted.generated_otp
+FROM dbo.hotel_guest_otp_record AS r
+JOIN #otp_status_keys AS k
+    ON r.hotel_code = k.hotel_code AND r.reservation_number = k.reservation_number
+    AND (k.room_no IS NULL OR r.room_no = k.room_no)
+    AND (k.check_in_date_time IS NULL OR r.check_in_date_time = k.check_in_date_time)
+    AND (k.check_out_date_time IS NULL OR r.check_out_date_time = k.check_out_date_time)
+WHERE {condition}"""
+
+# Live records, including those left in 'Revocation Pending' by an earlier failed revocation.
+LIVE_STATUS_CONDITION = "r.otp_status IS NULL OR r.otp_status NOT IN (%s)" % ", ".join(
+    f"'{status}'" for status in INACTIVE_OTP_STATUSES)
+PENDING_STATUS_CONDITION = "r.otp_status = '%s'" % OTP_STATUS_REVOCATION_PENDING
+PREGENERATED_STATUS_CONDITION = "r.otp_status = '%s'" % OTP_STATUS_PREGENERATED
+
+DROP_STATUS_KEYS_QUERY = "DROP TABLE #otp_status_keys"
+
+
+def parse_status_update_keys(body):
+    """
+    Reads the (hotel_code, reservation_number, room_no) keys of a PUT/DELETE body.
 
-            if guest_mobile_number:
-                query += " AND guest_mobile_number = ?"
-                params_list.append(guest_mobile_number)
+    The body holds a "rooms" list of {reservation_number, room_no (optional: every room of
+    the reservation), hotel_code (optional: the body's hotel_code)}. Raises ValueError for
+    malformed bodies.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("rooms"), list) or not body["rooms"]:
+        raise ValueError("Expected a non-empty 'rooms' list.")
+    keys = []
+    for index, room in enumerate(body["rooms"]):
+        if not isinstance(room, dict):
+            raise ValueError(f"Room {index} must be an object.")
+        hotel_code = room.get("hotel_code") or body.get("hotel_code")
+        reservation_number = room.get("reservation_number")
+        if not hotel_code or not reservation_number:
+            raise ValueError(f"Room {index} needs a hotel_code and a reservation_number.")
+        room_no = room.get("room_no")
+        keys.append((str(hotel_code), str(reservation_number), str(room_no) if room_no else None))
+    return list(dict.fromkeys(keys))
+
+
+def parse_revoke_flag(value):
+    """Reads the "revoke" flag of a PUT/DELETE body, which may be a boolean, 0/1 or "true"/"false"."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("true", "1", "yes"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("false", "0", "no"):
+        return False
+    raise ValueError("'revoke' must be true or false.")
+
+
+def update_otp_statuses(cursor, keys, otp_status, condition=LIVE_STATUS_CONDITION):
+    """
+    Sets otp_status on every record matching the keys and the condition in one set-based UPDATE.
 
-            if check_in_date_time:
-                query += " AND CAST(check_in_date_time AS DATE) = ?"
-                params_list.append(check_in_date_time)
+    Keys are (hotel_code, reservation_number[, room_no[, check_in_date_time, check_out_date_time]]);
+    missing or None parts match any value.
 
-            cursor.execute(query, params_list)
-            total_records = len(cursor.fetchall())
+    Returns:
+        list: (hotel_code, reservation_number, room_no, check_in_date_time, check_out_date_time,
+        generated_otp) of every updated record.
+    """
+    keys = [tuple(key) + (None,) * (5 - len(key)) for key in keys]
+    with stage_timer("sql.update_otp_status", keys=len(keys)) as span:
+        cursor.execute(CREATE_STATUS_KEYS_QUERY)
+        cursor.fast_executemany = True
+        cursor.executemany(INSERT_STATUS_KEY_QUERY, keys)
+        cursor.execute(UPDATE_STATUS_QUERY.format(condition=condition), (otp_status,))
+        updated = [tuple(row) for row in cursor.fetchall()]
+        cursor.execute(DROP_STATUS_KEYS_QUERY)
+        span["updated"] = len(updated)
+    logging.info(f"Set otp_status '{otp_status}' on {len(updated)} OTP records for {len(keys)} keys.")
+    return updated
+
+
+def change_otp_status(conn, body, otp_status, revoke=True):
+    """
+    Updates the status of a batch of rooms and revokes their lock PINs.
 
-            page = int(params.get("page", 1))
-            page_size = int(params.get("page_size", 10))
-            offset = (page - 1) * page_size
-            query += " ORDER BY check_in_date_time OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-            params_list.extend([offset, page_size])
+    With revoke, the records are first committed as 'Revocation Pending' so no vendor call
+    runs inside the transaction. PINs are then revoked concurrently, and only the records
+    whose PIN was revoked (or that had none) move to otp_status. The others stay pending and
+    are picked up again when the same request is retried.
 
-            cursor.execute(query, params_list)
+    Returns:
+        dict: Counts of updated and revoked records, keys that matched nothing and failed revocations.
+    """
+    keys = parse_status_update_keys(body)
+    cursor = conn.cursor()
+    updated = update_otp_statuses(cursor, keys, OTP_STATUS_REVOCATION_PENDING if revoke else otp_status)
+    with stage_timer("sql.commit"):
+        conn.commit()
+
+    forget_otp_records([
+        otp_idempotency_key(hotel_code, reservation_number, room_no, check_in, check_out)
+        for hotel_code, reservation_number, room_no, check_in, check_out, _ in updated
+    ])
+    invalidate_hotel_responses({row[0] for row in updated})
+
+    matched = {(row[0], row[1]) for row in updated} | {(row[0], row[1], row[2]) for row in updated}
+    not_found = [
+        {"hotel_code": key[0], "reservation_number": key[1], "room_no": key[2]}
+        for key in keys
+        if (key if key[2] else key[:2]) not in matched
+    ]
+
+    revoked = 0
+    revocation_failed = []
+    if revoke:
+        pin_rows = [row for row in updated if row[5]]
+        results = revoke_otp_locks([(row[2], row[5], row[0]) for row in pin_rows])
+        # Keyed on the full stay window, so a sibling record of the same room whose
+        # revocation failed stays pending.
+        done_keys = [row[:5] for row in updated if not row[5]]
+        for row, result in zip(pin_rows, results):
+            if result["error"]:
+                revocation_failed.append({"hotel_code": row[0], "reservation_number": row[1],
+                                          "room_no": row[2], "error": result["error"]})
+            else:
+                revoked += 1
+                done_keys.append(row[:5])
+
+        if done_keys:
+            update_otp_statuses(cursor, list(dict.fromkeys(done_keys)), otp_status, PENDING_STATUS_CONDITION)
+            with stage_timer("sql.commit"):
+                conn.commit()
+            invalidate_hotel_responses({key[0] for key in done_keys})
+        if revocation_failed:
+            logging.warning(f"{len(revocation_failed)} OTP records left '{OTP_STATUS_REVOCATION_PENDING}'.")
+
+    return {
+        "otp_status": otp_status,
+        "updated": len(updated),
+        "revoked": revoked,
+        "not_found": not_found,
+        "revocation_failed": revocation_failed,
+    }
+
+
+def query_otp_records(cursor, params):
+    """Runs a GET query against hotel_guest_otp_record and renders the JSON response."""
+    try:
+        where_clause, params_list = build_otp_record_filters(params)
+        fields = parse_fields(params)
+        page_size = int(params.get("page_size", 10))
+        max_page_size = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+        if not 1 <= page_size <= max_page_size:
+            raise ValueError(f"page_size must be between 1 and {max_page_size}.")
+        page = int(params.get("page", 1))
+        if page < 1:
+            raise ValueError("page must be at least 1.")
+        cursor_token = params.get("cursor")
+        after_key = decode_page_cursor(cursor_token) if cursor_token else None
+    except ValueError as e:
+        logging.error(f"Invalid GET parameters: {e}")
+        return func.HttpResponse(f"Invalid query parameters: {e}", status_code=400)
+
+    select_list = build_select_list(fields)
+    if cursor_token or params.get("pagination") == "keyset":
+        # Keyset pagination: seek past the last (check_in_date_time, id) seen instead of
+        # making SQL Server skip OFFSET rows, so deep pages cost the same as the first.
+        query = f"SELECT TOP (?) {select_list} FROM hotel_guest_otp_record WHERE {where_clause}"
+        query_params = [page_size + 1] + params_list
+        if after_key:
+            query += " AND (check_in_date_time > ? OR (check_in_date_time = ? AND id > ?))"
+            query_params.extend([after_key[0], after_key[0], after_key[1]])
+        query += " ORDER BY check_in_date_time, id"
+
+        with stage_timer("sql.get_keyset_page"):
+            cursor.execute(query, query_params)
             result = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            response_data = []
-            for row in result:
-                row_dict = {columns[i]: row[i] for i in range(len(columns))}
-                for key, value in row_dict.items():
-                    if isinstance(value, datetime):
-                        row_dict[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                response_data.append(row_dict)
-
-            return func.HttpResponse(
-                json.dumps({
-                    "data": response_data,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_records": total_records,
-                    "total_pages": (total_records + page_size - 1) // page_size
-                }),
-                mimetype="application/json"
-            )
-
-        elif method == "POST":
+        serialize = build_row_serializer(cursor.description, fields)
+        has_more = len(result) > page_size
+        result = result[:page_size]
+        next_cursor = None
+        if has_more:
+            last_row = dict(zip([column[0] for column in cursor.description], result[-1]))
+            next_cursor = encode_page_cursor(last_row["check_in_date_time"], last_row["id"])
+
+        return func.HttpResponse(
+            json.dumps({
+                "data": [serialize(row) for row in result],
+                "page_size": page_size,
+                "next_cursor": next_cursor
+            }),
+            mimetype="application/json"
+        )
+
+    with stage_timer("sql.count_records"):
+        cursor.execute(f"SELECT COUNT(*) FROM hotel_guest_otp_record WHERE {where_clause}", params_list)
+        total_records = cursor.fetchone()[0]
+
+    offset = (page - 1) * page_size
+    query = (
+        f"SELECT {select_list} FROM hotel_guest_otp_record WHERE {where_clause}"
+        " ORDER BY check_in_date_time, id OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+    )
+
+    with stage_timer("sql.get_page"):
+        cursor.execute(query, params_list + [offset, page_size])
+        result = cursor.fetchall()
+    serialize = build_row_serializer(cursor.description, fields)
+
+    return func.HttpResponse(
+        json.dumps({
+            "data": [serialize(row) for row in result],
+            "page": page,
+            "page_size": page_size,
+            "total_records": total_records,
+            "total_pages": (total_records + page_size - 1) // page_size
+        }),
+        mimetype="application/json"
+    )
+
+
+def get_otp_records(params, headers):
+    """
+    Serves GET requests from the response cache, querying Azure SQL on a miss.
+
+    Responses carry an ETag; a matching If-None-Match header gets a 304 without a body.
+    """
+    cache = get_response_cache()
+    hotel_code = str(params.get("hotel_code") or "").strip() or None
+    cache_key = normalize_cache_key(params)
+    cache_headers = {"Cache-Control": f"private, max-age={int(cache.ttl)}"}
+
+    cached = cache.get(hotel_code, cache_key)
+    if cached:
+        body, etag = cached
+        logging.info("Serving GET hotel_guest_otp from the response cache.")
+    else:
+        generations = cache.generations(hotel_code)
+        with get_db_connection() as conn:
+            response = query_otp_records(conn.cursor(), params)
+        if response.status_code != 200:
+            return response
+        body = response.get_body()
+        etag = cache.put(hotel_code, cache_key, body, generations)
+
+    cache_headers["ETag"] = etag
+    if etag_matches(headers.get("If-None-Match"), etag):
+        return func.HttpResponse(status_code=304, headers=cache_headers)
+    return func.HttpResponse(body, mimetype="application/json", headers=cache_headers)
+
+
+def handle_hotel_guest_otp_crud(method, params, body, headers=None):
+    """Handles CRUD operations for hotel guest OTP."""
+    logging.debug("Handling request with method: %s", method)
+
+    if method == "GET":
+        return get_otp_records(params, headers or {})
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        if method == "POST":
+            body = body or {}
             operation = body.get("operation", "").strip().lower()
             if operation != "checkin":
                 logging.error(f"Invalid operation: {operation}. Expected 'Checkin'.")
@@ -175,79 +727,59 @@ def handle_hotel_guest_otp_crud(method, params, body):
                     "Invalid operation. Only 'Checkin' is supported.", status_code=400
                 )
 
-            paramdata = extract_columns(body)
-            notification_data = []
-
-            for item in paramdata:
-                hotel_code = item.get("hotel_code")
-                guest_name = item.get("guest_name", "")
-                room_no = item.get("room_no")
-                room_name = item.get("room_name")
-                reservation_number = item.get("reservation_number", "")
-                otp_status = "OTP Generated"
-                guest_mobile_number = item.get("guest_mobile_number")
-                guest_email = item.get("guest_email")
-                check_in_date_time = item.get("check_in_date_time")
-                check_out_date_time = item.get("check_out_date_time")
-
-                if room_no:
-                    logging.info(f"Generating OTP for room: {room_no}")
-                    generated_otp_object = generate_otp_lock(room_no, check_in_date_time, check_out_date_time)
-                    if generated_otp_object:
-                        generated_otp = str(int(generated_otp_object["otp"]))+"#"
-                        otp_start_date_time = datetime.fromtimestamp(int(generated_otp_object["validStartTime"])).strftime("%Y-%m-%dT%H:%M:%S")
-                        otp_end_date_time = datetime.fromtimestamp(int(generated_otp_object["validEndTime"])).strftime("%Y-%m-%dT%H:%M:%S")
-
-                        notification_data.append({
-                            "phoneNumber": guest_mobile_number,
-                            "bodyValues": [
-                                guest_name,
-                                reservation_number,
-                                room_no,
-                                generated_otp,
-                                formatdatetime(otp_start_date_time),
-                                formatdatetime(otp_end_date_time),
-                            ],
-                        })
-
-
-                        cursor.execute(
-                            """INSERT INTO dbo.hotel_guest_otp_record (
-                                hotel_code, 
-                                guest_name, 
-                                guest_mobile_number,
-                                guest_email, 
-                                check_in_date_time,
-                                check_out_date_time, 
-                                generated_otp, 
-                                otp_start_date_time, 
-                                otp_end_date_time,
-                                room_no,
-                                room_name,
-                                reservation_number,
-                                otp_status
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                            (
-                                hotel_code,
-                                guest_name,
-                                guest_mobile_number,
-                                guest_email,
-                                datetime.fromtimestamp(int(check_in_date_time,)).strftime("%Y-%m-%dT%H:%M:%S"),
-                                datetime.fromtimestamp(int(check_out_date_time)).strftime("%Y-%m-%dT%H:%M:%S"),
-                                generated_otp,
-                                otp_start_date_time,
-                                otp_end_date_time,
-                                room_no,
-                                room_name,
-                                reservation_number,
-                                otp_status,
-                            ),
-                        )
-
-            conn.commit()
+            chunk_size = max(1, int(os.getenv("CHECKIN_CHUNK_SIZE", "50")))
+            failed_rooms = []
+            invalid_rows = []
+            new_otp_records = {}
+            touched_hotels = set()
+
+            # Rows stream out of the payload and are processed a chunk at a time, so peak
+            # memory is bounded by the chunk size rather than the number of rooms.
+            for chunk in iter_chunks(extract_columns(body), chunk_size):
+                for item in chunk:
+                    if item.get("error"):
+                        invalid_rows.append(f"{item.get('reservation_number')}/{item.get('room_no')}: {item['error']}")
+                valid_rows = [item for item in chunk if not item.get("error")]
+                touched_hotels.update(str(item.get("hotel_code")) for item in valid_rows if item.get("hotel_code"))
+                chunk_failed_rooms, chunk_records = process_checkin_rows(cursor, valid_rows, body.get("hotel_code"))
+                failed_rooms.extend(chunk_failed_rooms)
+                new_otp_records.update(chunk_records)
+
+            with stage_timer("sql.commit"):
+                conn.commit()
             logging.info("Database commit successful.")
-            call_send_notifications(notification_data)
-            return func.HttpResponse("OTP record added successfully.")
+            remember_otp_records(new_otp_records)
+            if new_otp_records or touched_hotels:
+                invalidate_hotel_responses(touched_hotels)
+
+            message = "OTP record added successfully."
+            if failed_rooms:
+                message += f" OTP generation failed for rooms: {', '.join(map(str, failed_rooms))}."
+            if invalid_rows:
+                message += f" Invalid rows: {'; '.join(invalid_rows)}."
+            return func.HttpResponse(message)
+
+        elif method in ("PUT", "DELETE"):
+            # PUT sets a closing status (e.g. early checkout or room move); DELETE revokes.
+            body = body or {}
+            otp_status = body.get("otp_status", OTP_STATUS_REVOKED) if method == "PUT" else OTP_STATUS_REVOKED
+            if otp_status not in INACTIVE_OTP_STATUSES:
+                return func.HttpResponse(
+                    f"Invalid otp_status. Use one of: {', '.join(INACTIVE_OTP_STATUSES)}.", status_code=400
+                )
+            try:
+                revoke = parse_revoke_flag(body.get("revoke", True))
+                if revoke and not revocation_configured():
+                    return func.HttpResponse(
+                        "PIN revocation is not configured (ATOMBERG_REVOKE_PIN_PATH). "
+                        "Send \"revoke\": false to change the status without revoking PINs.",
+                        status_code=400,
+                    )
+                summary = change_otp_status(conn, body, otp_status, revoke=revoke)
+            except ValueError as e:
+                logging.error(f"Invalid {method} body: {e}")
+                return func.HttpResponse(f"Invalid request body: {e}", status_code=400)
+            return func.HttpResponse(json.dumps(summary), mimetype="application/json")
 
         else:
             return func.HttpResponse("Unsupported HTTP method.", status_code=405)
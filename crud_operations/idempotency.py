@@ -0,0 +1,146 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from shared_utils.time_utils import epoch_to_sql_datetime
+
+# Reservation numbers per lookup query; keeps well under SQL Server's 2100 parameter limit.
+LOOKUP_CHUNK_SIZE = 1000
+
+# Statuses set by the PUT/DELETE path once a PIN has been revoked. Records in these states
+# no longer count as an existing OTP, so a later check-in for the same room gets a new one.
+INACTIVE_OTP_STATUSES = ("Revoked", "Checked Out", "Cancelled", "Room Moved")
+
+# Set by the PUT/DELETE path until the PIN is revoked on the lock. Such records no longer
+# count as an existing OTP either, but the status change can still be retried on them.
+OTP_STATUS_REVOCATION_PENDING = "Revocation Pending"
+
+LOOKUP_QUERY = """SELECT hotel_code, reservation_number, room_no, check_in_date_time, check_out_date_time,
+    generated_otp, otp_start_date_time, otp_end_date_time, otp_status
+FROM dbo.hotel_guest_otp_record
+WHERE hotel_code = ? AND reservation_number IN ({placeholders})
+    AND (otp_status IS NULL OR otp_status NOT IN (%s))""" % ", ".join(
+    f"'{status}'" for status in INACTIVE_OTP_STATUSES + (OTP_STATUS_REVOCATION_PENDING,))
+
+# Another instance can revoke, cancel or move a record at any time, so cached records are
+# only trusted for IDEMPOTENCY_CACHE_TTL_SECONDS; that covers PMS retries of the same check-in.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _window_value(value):
+    """Normalizes an epoch or a stored datetime to the string written by the check-in insert."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    if isinstance(value, str):
+        return value[:19].replace(" ", "T")
+    return epoch_to_sql_datetime(value)
+
+
+def otp_idempotency_key(hotel_code, reservation_number, room_no, check_in_date_time, check_out_date_time):
+    """Builds the key that identifies one room's OTP within a reservation and stay window."""
+    return (
+        str(hotel_code or ""),
+        str(reservation_number or ""),
+        str(room_no or ""),
+        _window_value(check_in_date_time),
+        _window_value(check_out_date_time),
+    )
+
+
+def item_idempotency_key(item):
+    """Builds the idempotency key of a row produced by extract_columns."""
+    return otp_idempotency_key(
+        item.get("hotel_code"),
+        item.get("reservation_number"),
+        item.get("room_no"),
+        item.get("check_in_date_time"),
+        item.get("check_out_date_time"),
+    )
+
+
+def _cache_get(key):
+    ttl = float(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", "15"))
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        stored_at, record = entry
+        if time.monotonic() - stored_at > ttl:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return record
+
+
+def remember_otp_records(records):
+    """
+    Adds committed OTP records to the in-process LRU, where they stay valid for
+    IDEMPOTENCY_CACHE_TTL_SECONDS.
+
+    Parameters:
+        records (dict): Idempotency key -> stored record fields.
+    """
+    max_size = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "2048"))
+    stored_at = time.monotonic()
+    with _cache_lock:
+        for key, record in records.items():
+            _cache[key] = (stored_at, record)
+            _cache.move_to_end(key)
+        while len(_cache) > max_size:
+            _cache.popitem(last=False)
+
+
+def forget_otp_records(keys):
+    """Drops records from the in-process LRU, e.g. after their PINs were revoked."""
+    with _cache_lock:
+        for key in keys:
+            _cache.pop(key, None)
+
+
+def find_existing_otp_records(cursor, items):
+    """
+    Returns the OTP records already stored for the given check-in rows.
+
+    Keys remembered within the last few seconds are answered from the in-process LRU; the
+    rest are looked up with one indexed query per hotel_code (chunked for very large
+    payloads), which also filters out records that are no longer live.
+
+    Returns:
+        dict: Idempotency key -> dict of generated_otp, otp_start_date_time, otp_end_date_time
+        and otp_status.
+    """
+    found = {}
+    missing = {}
+    for item in items:
+        key = item_idempotency_key(item)
+        record = _cache_get(key)
+        if record is not None:
+            found[key] = record
+        else:
+            missing.setdefault(key[0], set()).add(key[1])
+
+    for hotel_code, reservation_numbers in missing.items():
+        reservation_numbers = sorted(reservation_numbers)
+        for start in range(0, len(reservation_numbers), LOOKUP_CHUNK_SIZE):
+            chunk = reservation_numbers[start:start + LOOKUP_CHUNK_SIZE]
+            cursor.execute(
+                LOOKUP_QUERY.format(placeholders=", ".join("?" * len(chunk))),
+                [hotel_code] + chunk,
+            )
+            for row in cursor.fetchall():
+                key = otp_idempotency_key(row[0], row[1], row[2], row[3], row[4])
+                found[key] = {
+                    "generated_otp": row[5],
+                    "otp_start_date_time": _window_value(row[6]) if row[6] else None,
+                    "otp_end_date_time": _window_value(row[7]) if row[7] else None,
+                    "otp_status": row[8],
+                }
+
+                remember_otp_records({key: found[key]})
+
+    if found:
+        logging.info(f"Found {len(found)} existing OTP records for this check-in.")
+    return found
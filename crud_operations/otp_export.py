@@ -0,0 +1,121 @@
+import io
+import os
+import csv
+import json
+import logging
+import azure.functions as func
+from crud_operations.db_connection import get_db_connection
+from crud_operations.hotel_guest_otp import (
+    build_otp_record_filters, build_row_serializer, build_select_list, decode_page_cursor, encode_page_cursor,
+    parse_fields,
+)
+from shared_utils.metrics import stage_timer
+
+EXPORT_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def encode_ndjson_chunk(fields, serialize, rows, include_header=False):
+    """Encodes a chunk of rows as newline-delimited JSON."""
+    return "".join(json.dumps(serialize(row)) + "\n" for row in rows).encode()
+
+
+def encode_csv_chunk(fields, serialize, rows, include_header=False):
+    """Encodes a chunk of rows as CSV, preceded by the header row for the first chunk."""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    if include_header:
+        writer.writerow(fields)
+    for row in rows:
+        writer.writerow(serialize(row).values())
+    return text.getvalue().encode()
+
+
+CHUNK_ENCODERS = {
+    "ndjson": encode_ndjson_chunk,
+    "csv": encode_csv_chunk,
+}
+
+
+def export_otp_records(params):
+    """
+    Exports hotel_guest_otp_record rows as NDJSON or CSV.
+
+    Rows are read with fetchmany in chunks of EXPORT_FETCH_SIZE and each chunk is encoded
+    as soon as it is read, so only the encoded output is held in memory. A response carries
+    at most EXPORT_MAX_ROWS rows; when more match, the X-Next-Cursor header holds a keyset
+    cursor to pass back as `cursor` for the next part.
+
+    Parameters:
+        params (dict): The GET filters (see build_otp_record_filters) and fields, plus
+            format ('ndjson' or 'csv'), cursor and max_rows.
+
+    Returns:
+        func.HttpResponse: The encoded rows, or a 400 for invalid parameters.
+    """
+    export_format = (params.get("format") or "ndjson").strip().lower()
+    encode_chunk = CHUNK_ENCODERS.get(export_format)
+    if encode_chunk is None:
+        return func.HttpResponse(
+            f"Unsupported export format. Use one of: {', '.join(CHUNK_ENCODERS)}.", status_code=400
+        )
+
+    try:
+        where_clause, params_list = build_otp_record_filters(params)
+        fields = parse_fields(params)
+        max_rows = int(os.getenv("EXPORT_MAX_ROWS", "50000"))
+        if params.get("max_rows"):
+            max_rows = min(max_rows, int(params["max_rows"]))
+        cursor_token = params.get("cursor")
+        after_key = decode_page_cursor(cursor_token) if cursor_token else None
+    except ValueError as e:
+        logging.error(f"Invalid export parameters: {e}")
+        return func.HttpResponse(f"Invalid query parameters: {e}", status_code=400)
+    if max_rows < 1:
+        return func.HttpResponse("max_rows must be at least 1.", status_code=400)
+    fetch_size = max(1, int(os.getenv("EXPORT_FETCH_SIZE", "1000")))
+
+    # One row past the cap tells us whether another part follows.
+    query = f"SELECT TOP (?) {build_select_list(fields)} FROM hotel_guest_otp_record WHERE {where_clause}"
+    query_params = [max_rows + 1] + params_list
+    if after_key:
+        query += " AND (check_in_date_time > ? OR (check_in_date_time = ? AND id > ?))"
+        query_params.extend([after_key[0], after_key[0], after_key[1]])
+    query += " ORDER BY check_in_date_time, id"
+
+    output = io.BytesIO()
+    exported = 0
+    last_row = None
+    has_more = False
+    with get_db_connection() as conn, stage_timer("sql.export_records", format=export_format) as span:
+        cursor = conn.cursor()
+        cursor.execute(query, query_params)
+        serialize = build_row_serializer(cursor.description, fields)
+        columns = [column[0] for column in cursor.description]
+        id_index = columns.index("id")
+        check_in_index = columns.index("check_in_date_time")
+
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if exported + len(rows) > max_rows:
+                rows = rows[:max_rows - exported]
+                has_more = True
+            if rows:
+                output.write(encode_chunk(fields, serialize, rows, include_header=exported == 0))
+                exported += len(rows)
+                last_row = rows[-1]
+            if has_more:
+                break
+        if export_format == "csv" and exported == 0:
+            output.write(encode_chunk(fields, serialize, [], include_header=True))
+        span["rows"] = exported
+
+    headers = {"X-Exported-Rows": str(exported)}
+    if has_more:
+        headers["X-Next-Cursor"] = encode_page_cursor(last_row[check_in_index], last_row[id_index])
+    logging.info(f"Exported {exported} OTP records as {export_format}. More available: {has_more}.")
+    return func.HttpResponse(output.getvalue(), mimetype=EXPORT_MIMETYPES[export_format], headers=headers)
@@ -0,0 +1,117 @@
+import os
+import json
+import logging
+import threading
+import azure.functions as func
+from crud_operations.db_connection import get_db_connection
+from crud_operations.hotel_guest_otp import build_otp_record_filters
+from crud_operations.response_cache import ResponseCache, etag_matches, normalize_cache_key
+from shared_utils.metrics import stage_timer
+
+# All three aggregates run as one batch (three result sets) over the GET filters.
+STATS_QUERY = """SELECT hotel_code, CAST(check_in_date_time AS DATE) AS check_in_date, COUNT(*) AS otps
+FROM hotel_guest_otp_record WHERE {where}
+GROUP BY hotel_code, CAST(check_in_date_time AS DATE)
+ORDER BY hotel_code, check_in_date;
+
+SELECT hotel_code, otp_status, COUNT(*) AS records
+FROM hotel_guest_otp_record WHERE {where}
+GROUP BY hotel_code, otp_status
+ORDER BY hotel_code, otp_status;
+
+SELECT rooms, COUNT(*) AS reservations
+FROM (
+    SELECT hotel_code, reservation_number, COUNT(DISTINCT room_no) AS rooms
+    FROM hotel_guest_otp_record WHERE {where}
+    GROUP BY hotel_code, reservation_number
+) AS reservation_rooms
+GROUP BY rooms
+ORDER BY rooms;"""
+
+_stats_cache = None
+_stats_cache_lock = threading.Lock()
+
+
+def get_stats_cache():
+    """Returns the process-wide cache of rendered stats responses, creating it on first use."""
+    global _stats_cache
+    if _stats_cache is None:
+        with _stats_cache_lock:
+            if _stats_cache is None:
+                _stats_cache = ResponseCache(
+                    max_entries=int(os.getenv("STATS_CACHE_MAX_ENTRIES", "256")),
+                    ttl=float(os.getenv("STATS_CACHE_TTL_SECONDS", "60")),
+                )
+    return _stats_cache
+
+
+def query_otp_stats(cursor, where_clause, params_list):
+    """
+    Runs the grouped aggregates and returns them as JSON-ready series.
+
+    Returns:
+        dict: OTPs per hotel_code per check-in day, records per hotel_code and otp_status,
+        the distribution of rooms per reservation, and totals.
+    """
+    with stage_timer("sql.otp_stats"):
+        cursor.execute(STATS_QUERY.format(where=where_clause), params_list * 3)
+        daily = [
+            {"hotel_code": row[0], "date": row[1].isoformat(), "otps": row[2]}
+            for row in cursor.fetchall()
+        ]
+        cursor.nextset()
+        statuses = [
+            {"hotel_code": row[0], "otp_status": row[1], "records": row[2]}
+            for row in cursor.fetchall()
+        ]
+        cursor.nextset()
+        rooms_per_reservation = [
+            {"rooms": row[0], "reservations": row[1]}
+            for row in cursor.fetchall()
+        ]
+
+    return {
+        "daily": daily,
+        "statuses": statuses,
+        "rooms_per_reservation": rooms_per_reservation,
+        "totals": {
+            "otps": sum(point["otps"] for point in daily),
+            "reservations": sum(point["reservations"] for point in rooms_per_reservation),
+        },
+    }
+
+
+def get_otp_stats(params, headers=None):
+    """
+    Serves aggregate OTP activity for the GET filters (hotel_code, reservation_number,
+    guest_mobile_number, check_in_date_time, check_in_from, check_in_to).
+
+    Responses are cached per filter set for STATS_CACHE_TTL_SECONDS (default 60) and carry
+    an ETag; a matching If-None-Match header gets a 304.
+    """
+    headers = headers or {}
+    try:
+        where_clause, params_list = build_otp_record_filters(params)
+    except ValueError as e:
+        logging.error(f"Invalid stats parameters: {e}")
+        return func.HttpResponse(f"Invalid query parameters: {e}", status_code=400)
+
+    cache = get_stats_cache()
+    hotel_code = str(params.get("hotel_code") or "").strip() or None
+    cache_key = normalize_cache_key(params)
+    cache_headers = {"Cache-Control": f"private, max-age={int(cache.ttl)}"}
+
+    cached = cache.get(hotel_code, cache_key)
+    if cached:
+        body, etag = cached
+    else:
+        generations = cache.generations(hotel_code)
+        with get_db_connection() as conn:
+            stats = query_otp_stats(conn.cursor(), where_clause, params_list)
+        body = json.dumps(stats)
+        etag = cache.put(hotel_code, cache_key, body, generations)
+
+    cache_headers["ETag"] = etag
+    if etag_matches(headers.get("If-None-Match"), etag):
+        return func.HttpResponse(status_code=304, headers=cache_headers)
+    return func.HttpResponse(body, mimetype="application/json", headers=cache_headers)
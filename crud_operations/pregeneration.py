@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+import pyodbc
+from crud_operations.db_connection import get_db_connection
+from crud_operations.hotel_guest_otp import (
+    OTP_STATUS_PREGENERATED, extract_columns, generate_otp_records, insert_otp_records, iter_chunks,
+)
+from crud_operations.idempotency import find_existing_otp_records, item_idempotency_key, remember_otp_records
+from crud_operations.response_cache import invalidate_hotel_responses
+from shared_utils.metrics import stage_timer
+from shared_utils.scheduler import PRIORITY_BACKGROUND
+
+# Rows are bulk-loaded into a session temp table and staged with one INSERT ... SELECT, so
+# rowcount is the number of rooms actually inserted. UPDLOCK/HOLDLOCK on the existence check
+# keeps a concurrent push of the same rooms from passing it too and then hitting
+# UQ_hotel_guest_arrival_staging_room.
+CREATE_ARRIVAL_ROWS_QUERY = """IF OBJECT_ID('tempdb..#arrival_rows') IS NOT NULL DROP TABLE #arrival_rows;
+CREATE TABLE #arrival_rows (
+    hotel_code NVARCHAR(50) NOT NULL,
+    guest_name NVARCHAR(200) NULL,
+    guest_mobile_number NVARCHAR(20) NULL,
+    guest_email NVARCHAR(200) NULL,
+    reservation_number NVARCHAR(100) NOT NULL,
+    room_no NVARCHAR(50) NOT NULL,
+    room_name NVARCHAR(100) NULL,
+    check_in_epoch BIGINT NOT NULL,
+    check_out_epoch BIGINT NOT NULL
+)"""
+
+INSERT_ARRIVAL_ROW_QUERY = """INSERT INTO #arrival_rows (
+    hotel_code, guest_name, guest_mobile_number, guest_email, reservation_number,
+    room_no, room_name, check_in_epoch, check_out_epoch
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+STAGE_ARRIVALS_QUERY = """INSERT INTO dbo.hotel_guest_arrival_staging (
+    hotel_code, guest_name, guest_mobile_number, guest_email, reservation_number,
+    room_no, room_name, check_in_epoch, check_out_epoch
+)
+SELECT s.hotel_code, s.guest_name, s.guest_mobile_number, s.guest_email, s.reservation_number,
+    s.room_no, s.room_name, s.check_in_epoch, s.check_out_epoch
+FROM #arrival_rows AS s
+WHERE NOT EXISTS (
+    SELECT 1 FROM dbo.hotel_guest_arrival_staging AS t WITH (UPDLOCK, HOLDLOCK)
+    WHERE t.hotel_code = s.hotel_code AND t.reservation_number = s.reservation_number
+        AND t.room_no = s.room_no AND t.check_in_epoch = s.check_in_epoch
+        AND t.check_out_epoch = s.check_out_epoch
+)"""
+
+DROP_ARRIVAL_ROWS_QUERY = "DROP TABLE #arrival_rows"
+
+# As with the notification outbox, a claim pushes next_attempt_at out by a lease so rows
+# claimed by a worker that dies mid-batch become due again on their own.
+CLAIM_ARRIVALS_QUERY = """UPDATE TOP (?) dbo.hotel_guest_arrival_staging WITH (ROWLOCK, READPAST)
+SET attempts = attempts + 1,
+    next_attempt_at = DATEADD(SECOND, ?, SYSUTCDATETIME())
+OUTPUT inserted.id, inserted.hotel_code, inserted.guest_name, inserted.guest_mobile_number,
+    inserted.guest_email, inserted.reservation_number, inserted.room_no, inserted.room_name,
+    inserted.check_in_epoch, inserted.check_out_epoch, inserted.attempts
+WHERE status = 'Pending' AND next_attempt_at <= SYSUTCDATETIME()
+    AND check_in_epoch <= ? AND check_out_epoch > ?"""
+
+MARK_ARRIVAL_QUERY = """UPDATE dbo.hotel_guest_arrival_staging
+SET status = ?, processed_at = SYSUTCDATETIME()
+WHERE id = ?"""
+
+
+def stage_rows(cursor, rows):
+    """
+    Stages arrival rows that are not staged yet and returns how many were inserted.
+
+    If a concurrent push still wins the race for a room, the unique key rejects the
+    statement; it is retried once, and the existence check then skips that room.
+    """
+    with stage_timer("sql.stage_arrivals", rows=len(rows)) as span:
+        cursor.execute(CREATE_ARRIVAL_ROWS_QUERY)
+        cursor.fast_executemany = True
+        cursor.executemany(INSERT_ARRIVAL_ROW_QUERY, rows)
+        try:
+            cursor.execute(STAGE_ARRIVALS_QUERY)
+        except pyodbc.IntegrityError:
+            logging.warning("Arrival rows were staged concurrently; retrying without them.")
+            cursor.execute(STAGE_ARRIVALS_QUERY)
+        inserted = max(0, cursor.rowcount)
+        cursor.execute(DROP_ARRIVAL_ROWS_QUERY)
+        span["inserted"] = inserted
+    return inserted
+
+
+def stage_upcoming_arrivals(body):
+    """
+    Stores the rooms of an eZee reservation payload for OTP pre-generation.
+
+    The lock window is computed exactly as for a check-in. Rooms already staged are skipped.
+
+    Returns:
+        dict: Counts of staged, skipped (already staged) and invalid rows.
+    """
+    chunk_size = max(1, int(os.getenv("CHECKIN_CHUNK_SIZE", "50")))
+    summary = {"staged": 0, "skipped": 0, "invalid": 0}
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for chunk in iter_chunks(extract_columns(body), chunk_size):
+            rows = {}
+            valid = 0
+            for item in chunk:
+                if item.get("error"):
+                    summary["invalid"] += 1
+                    continue
+                valid += 1
+                key = (
+                    item["hotel_code"], item["reservation_number"], item["room_no"],
+                    item["check_in_date_time"], item["check_out_date_time"],
+                )
+                rows[key] = (
+                    item["hotel_code"], item["guest_name"], item["guest_mobile_number"], item["guest_email"],
+                    item["reservation_number"], item["room_no"], item["room_name"],
+                    item["check_in_date_time"], item["check_out_date_time"],
+                )
+            inserted = stage_rows(cursor, list(rows.values())) if rows else 0
+            summary["staged"] += inserted
+            summary["skipped"] += valid - inserted
+        conn.commit()
+
+    logging.info(f"Staged upcoming arrivals: {summary}")
+    return summary
+
+
+def pregenerate_upcoming_otps(batch_size=None):
+    """
+    Generates lock PINs for staged arrivals whose window starts within the look-ahead period.
+
+    Records are stored with otp_status 'Pre-generated'; the check-in POST later activates them
+    and sends the notifications. Rooms that already have a record are marked done without a
+    vendor call. Failed rooms are retried on later runs until PREGENERATION_MAX_ATTEMPTS.
+
+    Returns:
+        dict: Counts of claimed, pre-generated, already existing, retrying and failed rooms.
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv("PREGENERATION_BATCH_SIZE", "200"))
+    lookahead_seconds = int(float(os.getenv("PREGENERATION_LOOKAHEAD_HOURS", "24")) * 3600)
+    lease_seconds = int(os.getenv("PREGENERATION_CLAIM_LEASE_SECONDS", "600"))
+    max_attempts = int(os.getenv("PREGENERATION_MAX_ATTEMPTS", "3"))
+    now = int(time.time())
+    summary = {"claimed": 0, "pregenerated": 0, "existing": 0, "retrying": 0, "failed": 0}
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CLAIM_ARRIVALS_QUERY, (batch_size, lease_seconds, now + lookahead_seconds, now))
+        claimed = cursor.fetchall()
+        conn.commit()
+        summary["claimed"] = len(claimed)
+        if not claimed:
+            return summary
+
+        items = []
+        for row in claimed:
+            items.append({
+                "staging_id": row[0],
+                "hotel_code": row[1],
+                "guest_name": row[2] or "",
+                "guest_mobile_number": row[3],
+                "guest_email": row[4],
+                "reservation_number": row[5] or "",
+                "room_no": row[6],
+                "room_name": row[7],
+                "check_in_date_time": row[8],
+                "check_out_date_time": row[9],
+                "attempts": row[10],
+            })
+
+        existing_records = find_existing_otp_records(cursor, items)
+        marks = []
+        pending = []
+        for item in items:
+            if item_idempotency_key(item) in existing_records:
+                marks.append((OTP_STATUS_PREGENERATED, item["staging_id"]))
+                summary["existing"] += 1
+            else:
+                pending.append(item)
+
+        new_otp_records = {}
+        if pending:
+            failed_rooms, otp_records, _, new_otp_records = generate_otp_records(
+                pending, OTP_STATUS_PREGENERATED, priority=PRIORITY_BACKGROUND
+            )
+            insert_otp_records(cursor, otp_records)
+            for item in pending:
+                if item_idempotency_key(item) in new_otp_records:
+                    marks.append((OTP_STATUS_PREGENERATED, item["staging_id"]))
+                    summary["pregenerated"] += 1
+                elif item["attempts"] >= max_attempts:
+                    marks.append(("Failed", item["staging_id"]))
+                    summary["failed"] += 1
+                else:
+                    summary["retrying"] += 1
+
+        if marks:
+            cursor.executemany(MARK_ARRIVAL_QUERY, marks)
+        conn.commit()
+        remember_otp_records(new_otp_records)
+        if new_otp_records:
+            invalidate_hotel_responses({str(item["hotel_code"]) for item in pending if item["hotel_code"]})
+
+    logging.info(f"OTP pre-generation finished: {summary}")
+    return summary
@@ -0,0 +1,184 @@
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from shared_utils.metrics import increment
+
+
+def normalize_cache_key(params):
+    """Builds a cache key from query parameters, ignoring order, surrounding blanks and empty values."""
+    return tuple(sorted(
+        (str(name).strip().lower(), str(value).strip())
+        for name, value in params.items()
+        if value is not None and str(value).strip()
+    ))
+
+
+def make_etag(body):
+    """Returns a strong ETag for a response body."""
+    if isinstance(body, str):
+        body = body.encode()
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Returns True if an If-None-Match header value matches the ETag (weak comparison)."""
+    if not if_none_match or not etag:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in [candidate[2:] if candidate.startswith("W/") else candidate
+                                         for candidate in candidates]
+
+
+class ResponseCache:
+    """
+    A bounded, TTL-limited LRU cache of rendered GET responses, grouped by hotel_code.
+
+    invalidate(hotel_code) drops the property's entries and those not scoped to a property.
+    With shared_dir set (e.g. a folder under /home, which every instance of the app mounts),
+    invalidations are also written there as per-property generation markers, so a POST
+    handled by one instance expires the entries cached by the others.
+    """
+
+    def __init__(self, max_entries=1024, ttl=15, shared_dir=None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._shared_dir = shared_dir
+        self._entries = OrderedDict()
+        self._local_generations = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    def get(self, hotel_code, key):
+        """Returns the cached (body, etag) for a key, or None if missing, expired or invalidated."""
+        if self._max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get((hotel_code, key))
+            if entry is not None:
+                self._entries.move_to_end((hotel_code, key))
+        if entry is None or time.monotonic() - entry["stored_at"] > self._ttl or \
+                entry["generations"] != self.generations(hotel_code):
+            increment("response_cache.miss")
+            return None
+        increment("response_cache.hit")
+        return entry["body"], entry["etag"]
+
+    def put(self, hotel_code, key, body, generations):
+        """
+        Caches a response body and returns its ETag.
+
+        generations must be taken with generations() before the data was read, so a response
+        built concurrently with an invalidation is never served after it.
+        """
+        etag = make_etag(body)
+        if self._max_entries <= 0:
+            return etag
+        entry = {
+            "body": body,
+            "etag": etag,
+            "stored_at": time.monotonic(),
+            "generations": generations,
+        }
+        with self._lock:
+            self._entries[(hotel_code, key)] = entry
+            self._entries.move_to_end((hotel_code, key))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self, hotel_code=None):
+        """Drops the entries of a property, plus those not filtered by property."""
+        with self._lock:
+            stale = [cache_key for cache_key in self._entries
+                     if cache_key[0] is None or hotel_code is None or cache_key[0] == hotel_code]
+            for cache_key in stale:
+                del self._entries[cache_key]
+            for marker in ("all" if hotel_code is None else f"hotel:{hotel_code}", "any"):
+                self._local_generations[marker] = self._local_generations.get(marker, 0) + 1
+                self._write_generation(marker)
+        if stale:
+            increment("response_cache.invalidated", len(stale))
+
+    def generations(self, hotel_code):
+        """Returns the invalidation state that entries of a property are checked against."""
+        markers = self._markers(hotel_code)
+        with self._lock:
+            local = tuple(self._local_generations.get(marker, 0) for marker in markers)
+        return local + self._read_shared_generations(markers)
+
+    def stats(self):
+        """Returns the number of cached responses."""
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self._max_entries, "ttl_seconds": self._ttl}
+
+    def _generation_path(self, marker):
+        return os.path.join(self._shared_dir, f"generation-{hashlib.sha1(marker.encode()).hexdigest()}")
+
+    @staticmethod
+    def _markers(hotel_code):
+        # A property's entries expire with its own marker or a global one; unscoped entries
+        # span every property, so they follow a marker bumped by any invalidation.
+        if hotel_code is None:
+            return ("any",)
+        return (f"hotel:{hotel_code}", "all")
+
+    def _read_shared_generations(self, markers):
+        if not self._shared_dir:
+            return ()
+        generations = []
+        for marker in markers:
+            try:
+                with open(self._generation_path(marker)) as marker_file:
+                    generations.append(marker_file.read())
+            except FileNotFoundError:
+                generations.append("")
+            except OSError:
+                # Treat an unreadable marker as an invalidation rather than risk a stale hit.
+                logging.warning("Could not read a response cache generation marker.")
+                generations.append(uuid.uuid4().hex)
+        return tuple(generations)
+
+    def _write_generation(self, marker):
+        if not self._shared_dir:
+            return
+        try:
+            os.makedirs(self._shared_dir, exist_ok=True)
+            path = self._generation_path(marker)
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "w") as marker_file:
+                marker_file.write(uuid.uuid4().hex)
+            os.replace(temp_path, path)
+        except OSError:
+            logging.exception("Could not write a response cache generation marker.")
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Returns the process-wide GET response cache, creating it on first use."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+                    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "15")),
+                    shared_dir=os.getenv("RESPONSE_CACHE_SHARED_DIR") or None,
+                )
+    return _response_cache
+
+
+def invalidate_hotel_responses(hotel_codes):
+    """Invalidates the cached GET responses of the given properties."""
+    cache = get_response_cache()
+    for hotel_code in set(hotel_codes) or {None}:
+        cache.invalidate(hotel_code)
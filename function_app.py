@@ -1,48 +1,96 @@
+import os
+import json
 import logging
 import azure.functions as func
-from crud_operations.hotel_guest_otp import handle_hotel_guest_otp_crud
-from atomberg_locks.lock_functions import generate_otp_lock
-from otp_notifications.sendnotifications import send_whatsapp_notification, send_sms_notification
+from shared_utils.metrics import stage_timer, get_metrics_snapshot, get_counters_snapshot
+from shared_utils.startup import lazy_import, warm_up, start_background_warm_up, get_startup_report
+from shared_utils.log_utils import install_log_redaction, log_event
+from shared_utils.telemetry import configure_telemetry
+
+# Stage metrics and traces go to Application Insights when azure-monitor-opentelemetry is installed.
+configure_telemetry()
+
+# Tokens, OTPs and phone numbers are masked in every log record the app writes.
+install_log_redaction()
+
+# Subsystems are imported by the routes that need them (see shared_utils.startup), so
+# pyodbc, requests and pytz are only loaded when a route actually uses them.
 
 # Initialize the FunctionApp
 app = func.FunctionApp()
 
+# The warmup trigger below only runs on Premium and Dedicated plans, so every instance also
+# warms its SQL connection, Atomberg token and lock lists in the background once it loads.
+start_background_warm_up()
+
 @app.route(route="hotel_guest_otp")  # Defining route
 def hotel_guest_otp(req: func.HttpRequest) -> func.HttpResponse:
     try:
-        logging.info('hotel_guest_otp: Received request.')
         method = req.method
         params = req.params
-        logging.info(f'hotel_guest_otp: Method - {method}, Params - {params}')
-        
-        body = req.get_json() if method in ["POST", "PUT"] else None
-        if body:
-            logging.info(f'hotel_guest_otp: Request body - {body}')
-        
-        logging.info('hotel_guest_otp: Calling handle_hotel_guest_otp_crud.')
-        response = handle_hotel_guest_otp_crud(method, params, body)
-        logging.info('hotel_guest_otp: Response generated successfully.')
+        body = None
+        if method in ["POST", "PUT", "DELETE"] and req.get_body():
+            try:
+                body = req.get_json()
+            except ValueError:
+                return func.HttpResponse("Request body must be valid JSON.", status_code=400)
+        log_event("hotel_guest_otp.request", sample="hotel_guest_otp", method=method, params=dict(params),
+                  body_bytes=len(req.get_body() or b""))
+
+        with stage_timer("route.hotel_guest_otp", method=method) as span:
+            hotel_guest_otp_crud = lazy_import("crud_operations.hotel_guest_otp")
+            response = hotel_guest_otp_crud.handle_hotel_guest_otp_crud(method, params, body, req.headers)
+            span["status_code"] = response.status_code
+        log_event("hotel_guest_otp.response", sample="hotel_guest_otp", status_code=response.status_code)
         return response
         
     except Exception as e:
         logging.error(f'hotel_guest_otp: Error occurred - {str(e)}', exc_info=True)
         return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
 
+@app.route(route="hotel_guest_otp_export", methods=["GET"])  # Defining route
+def hotel_guest_otp_export(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        log_event("hotel_guest_otp_export.request", sample="hotel_guest_otp_export", params=dict(req.params))
+        with stage_timer("route.hotel_guest_otp_export") as span:
+            otp_export = lazy_import("crud_operations.otp_export")
+            response = otp_export.export_otp_records(req.params)
+            span["status_code"] = response.status_code
+        log_event("hotel_guest_otp_export.response", sample="hotel_guest_otp_export",
+                  status_code=response.status_code)
+        return response
+
+    except Exception as e:
+        logging.error(f'hotel_guest_otp_export: Error occurred - {str(e)}', exc_info=True)
+        return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
+
+@app.route(route="hotel_guest_otp_stats", methods=["GET"])  # Defining route
+def hotel_guest_otp_stats(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        log_event("hotel_guest_otp_stats.request", sample="hotel_guest_otp_stats", params=dict(req.params))
+        with stage_timer("route.hotel_guest_otp_stats") as span:
+            otp_stats = lazy_import("crud_operations.otp_stats")
+            response = otp_stats.get_otp_stats(req.params, req.headers)
+            span["status_code"] = response.status_code
+        log_event("hotel_guest_otp_stats.response", sample="hotel_guest_otp_stats",
+                  status_code=response.status_code)
+        return response
+
+    except Exception as e:
+        logging.error(f'hotel_guest_otp_stats: Error occurred - {str(e)}', exc_info=True)
+        return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
+
 @app.route(route="atomberg_generate_otp")  # Defining route
 def atomberg_generate_otp(req: func.HttpRequest) -> func.HttpResponse:
     try:
-        logging.info('atomberg_generate_otp: Received request.')
         method = req.method
         params = req.params
-        logging.info(f'atomberg_generate_otp: Method - {method}, Params - {params}')
-        
-        body = req.get_json() if method in ["POST", "PUT"] else None
-        if body:
-            logging.info(f'atomberg_generate_otp: Request body - {body}')
-        
-        logging.info('atomberg_generate_otp: Generating OTP for lock.')
-        response = generate_otp_lock("AV 303", 1731754003, 1731757603)
-        logging.info('atomberg_generate_otp: OTP generated successfully.')
+        log_event("atomberg_generate_otp.request", sample="atomberg_generate_otp", method=method,
+                  params=dict(params), body_bytes=len(req.get_body() or b""))
+
+        with stage_timer("route.atomberg_generate_otp"):
+            lock_functions = lazy_import("atomberg_locks.lock_functions")
+            response = lock_functions.generate_otp_lock("AV 303", 1731754003, 1731757603)
         return response
         
     except Exception as e:
@@ -52,24 +100,118 @@ def atomberg_generate_otp(req: func.HttpRequest) -> func.HttpResponse:
 @app.route(route="send_otp_notifications")  # Defining route
 def send_otp_notifications(req: func.HttpRequest) -> func.HttpResponse:
     try:
-        logging.info('send_otp_notifications: Received request.')
         method = req.method
         params = req.params
-        logging.info(f'send_otp_notifications: Method - {method}, Params - {params}')
-        
         body = req.get_json() if method == "POST" else None
-        if body:
-            logging.info(f'send_otp_notifications: Request body - {body}')
-        
-        logging.info('send_otp_notifications: Sending OTP notification.')
-        response = send_sms_notification(body)
-        logging.info('send_otp_notifications: Notification sent successfully.')
+        log_event("send_otp_notifications.request", sample="send_otp_notifications", method=method,
+                  params=dict(params), body_bytes=len(req.get_body() or b""))
+
+        with stage_timer("route.send_otp_notifications"):
+            sendnotifications = lazy_import("otp_notifications.sendnotifications")
+            response = sendnotifications.send_sms_notification(body)
         return response
         
     except Exception as e:
         logging.error(f'send_otp_notifications: Error occurred - {str(e)}', exc_info=True)
         return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
 
+@app.timer_trigger(schedule="*/15 * * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+def dispatch_notification_outbox(timer: func.TimerRequest) -> None:
+    try:
+        outbox = lazy_import("otp_notifications.outbox")
+        max_batches = int(os.getenv("NOTIFICATION_DISPATCH_MAX_BATCHES", "10"))
+        for batch in range(max_batches):
+            summary = outbox.dispatch_outbox()
+            if not summary["claimed"]:
+                break
+        log_event("dispatch_notification_outbox.drained", sample="dispatch_notification_outbox", batches=batch + 1)
+
+    except Exception as e:
+        logging.error(f'dispatch_notification_outbox: Error occurred - {str(e)}', exc_info=True)
+
+@app.route(route="upcoming_arrivals", methods=["POST"])  # Defining route
+def upcoming_arrivals(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        body = req.get_json()
+        log_event("upcoming_arrivals.request", sample="upcoming_arrivals", body_bytes=len(req.get_body() or b""))
+
+        with stage_timer("route.upcoming_arrivals"):
+            pregeneration = lazy_import("crud_operations.pregeneration")
+            summary = pregeneration.stage_upcoming_arrivals(body)
+        logging.info('upcoming_arrivals: Arrivals staged successfully.')
+        return func.HttpResponse(json.dumps(summary), mimetype="application/json")
+
+    except ValueError as e:
+        logging.error(f'upcoming_arrivals: Invalid request body - {str(e)}')
+        return func.HttpResponse("Invalid JSON body.", status_code=400)
+    except Exception as e:
+        logging.error(f'upcoming_arrivals: Error occurred - {str(e)}', exc_info=True)
+        return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
+
+@app.timer_trigger(schedule="0 */10 * * * *", arg_name="timer", run_on_startup=False, use_monitor=True)
+def pregenerate_arrival_otps(timer: func.TimerRequest) -> None:
+    try:
+        logging.info('pregenerate_arrival_otps: Pre-generating OTPs for upcoming arrivals.')
+        pregeneration = lazy_import("crud_operations.pregeneration")
+        max_batches = int(os.getenv("PREGENERATION_MAX_BATCHES", "5"))
+        for _ in range(max_batches):
+            summary = pregeneration.pregenerate_upcoming_otps()
+            if not summary["claimed"]:
+                break
+        logging.info('pregenerate_arrival_otps: Pre-generation finished.')
+
+    except Exception as e:
+        logging.error(f'pregenerate_arrival_otps: Error occurred - {str(e)}', exc_info=True)
+
+@app.route(route="diagnostics/db_pool", methods=["GET"])  # Defining route
+def db_pool_diagnostics(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        logging.info('db_pool_diagnostics: Received request.')
+        db_connection = lazy_import("crud_operations.db_connection")
+        return func.HttpResponse(json.dumps(db_connection.get_db_pool_stats()), mimetype="application/json")
+
+    except Exception as e:
+        logging.error(f'db_pool_diagnostics: Error occurred - {str(e)}', exc_info=True)
+        return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
+
+@app.route(route="diagnostics/metrics", methods=["GET"])  # Defining route
+def metrics_diagnostics(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        logging.info('metrics_diagnostics: Received request.')
+        resilience = lazy_import("shared_utils.resilience")
+        scheduler = lazy_import("shared_utils.scheduler")
+        lock_functions = lazy_import("atomberg_locks.lock_functions")
+        response_cache = lazy_import("crud_operations.response_cache")
+        metrics = dict(get_counters_snapshot(), stages=get_metrics_snapshot(),
+                       circuits=resilience.get_circuit_states(), queues=scheduler.get_scheduler_stats(),
+                       lock_registry=lock_functions.lock_registry.stats(),
+                       response_cache=response_cache.get_response_cache().stats())
+        return func.HttpResponse(json.dumps(metrics), mimetype="application/json")
+
+    except Exception as e:
+        logging.error(f'metrics_diagnostics: Error occurred - {str(e)}', exc_info=True)
+        return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
+
+@app.route(route="diagnostics/startup", methods=["GET"])  # Defining route
+def startup_diagnostics(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        logging.info('startup_diagnostics: Received request.')
+        return func.HttpResponse(json.dumps(get_startup_report()), mimetype="application/json")
+
+    except Exception as e:
+        logging.error(f'startup_diagnostics: Error occurred - {str(e)}', exc_info=True)
+        return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
+
+@app.warm_up_trigger("warmup")
+def warm_up_instance(warmup) -> None:
+    try:
+        logging.info('warm_up_instance: Warming up connections and caches.')
+        report = warm_up()
+        logging.info(f'warm_up_instance: Warm-up finished - {report["initialization"]}')
+
+    except Exception as e:
+        logging.error(f'warm_up_instance: Error occurred - {str(e)}', exc_info=True)
+
 
 # @app.route(route="http_trigger", auth_level=func.AuthLevel.FUNCTION)
 # def http_trigger(req: func.HttpRequest) -> func.HttpResponse:
@@ -0,0 +1,82 @@
+import os
+from otp_notifications.sendnotifications import WHATSAPP_TEMPLATE
+
+# bodyValues positions: guest name, reservation number, room, OTP, window start, window end.
+RESERVATION_INDEX = 1
+ROOM_INDEX = 2
+OTP_INDEX = 3
+
+
+def _grouping_key(notification):
+    """
+    Rooms share a message when they have the same guest number, booking and OTP window.
+
+    bodyValues carries the per-room SubBookingId, so the booking comes from "bookingId" (the
+    reservation's UniqueID), falling back to the sub-booking for older outbox payloads.
+    """
+    body_values = notification["bodyValues"]
+    booking_id = notification.get("bookingId") or body_values[RESERVATION_INDEX]
+    return notification.get("phoneNumber"), booking_id, body_values[4], body_values[5]
+
+
+def _merge(notifications):
+    body_values = list(notifications[0]["bodyValues"])
+    sub_bookings = {notification["bodyValues"][RESERVATION_INDEX] for notification in notifications}
+    if len(sub_bookings) > 1:
+        body_values[RESERVATION_INDEX] = notifications[0].get("bookingId") or ", ".join(sorted(map(str, sub_bookings)))
+    body_values[ROOM_INDEX] = ", ".join(str(notification["bodyValues"][ROOM_INDEX]) for notification in notifications)
+    body_values[OTP_INDEX] = ", ".join(str(notification["bodyValues"][OTP_INDEX]) for notification in notifications)
+    return {
+        "phoneNumber": notifications[0].get("phoneNumber"),
+        "bodyValues": body_values,
+        "bookingId": notifications[0].get("bookingId"),
+        "rooms": len(notifications),
+        "template": os.getenv("WHATSAPP_MULTI_ROOM_TEMPLATE", WHATSAPP_TEMPLATE),
+    }
+
+
+def consolidate_notifications(notifications):
+    """
+    Merges per-room WhatsApp notifications into one multi-room message per guest and booking.
+
+    Rooms are added to a message while it stays within NOTIFICATION_MAX_ROOMS_PER_MESSAGE and
+    every template parameter stays within WHATSAPP_TEMPLATE_PARAM_MAX_CHARS; the rest of the
+    rooms start another message. Single-room notifications are returned unchanged.
+
+    SMS is not consolidated: DLT template variables are capped at 30 characters, which a
+    merged room and OTP list does not fit.
+
+    Parameters:
+        notifications (list): Per-room dicts with phoneNumber, bodyValues and bookingId.
+
+    Returns:
+        list: Notifications to send, in the order their first room arrived.
+    """
+    groups = {}
+    for notification in notifications:
+        groups.setdefault(_grouping_key(notification), []).append(notification)
+    if len(groups) == len(notifications):
+        return list(notifications)
+
+    max_rooms = max(1, int(os.getenv("NOTIFICATION_MAX_ROOMS_PER_MESSAGE", "10")))
+    max_chars = int(os.getenv("WHATSAPP_TEMPLATE_PARAM_MAX_CHARS", "1024"))
+    consolidated = []
+
+    def fits(chunk):
+        return all(len(str(value)) <= max_chars for value in _merge(chunk)["bodyValues"])
+
+    def flush(chunk):
+        if len(chunk) == 1:
+            consolidated.append(chunk[0])
+        elif chunk:
+            consolidated.append(_merge(chunk))
+
+    for group in groups.values():
+        chunk = []
+        for notification in group:
+            if chunk and (len(chunk) >= max_rooms or not fits(chunk + [notification])):
+                flush(chunk)
+                chunk = []
+            chunk.append(notification)
+        flush(chunk)
+    return consolidated
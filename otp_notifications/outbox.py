@@ -0,0 +1,133 @@
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from crud_operations.db_connection import get_db_connection
+from shared_utils.metrics import stage_timer
+from otp_notifications.sendnotifications import send_whatsapp_notification, send_sms_notification
+from otp_notifications.consolidation import consolidate_notifications
+
+NOTIFICATION_CHANNELS = ("whatsapp", "sms")
+
+ENQUEUE_QUERY = """INSERT INTO dbo.hotel_guest_notification_outbox (hotel_code, channel, payload)
+VALUES (?, ?, ?)"""
+
+# Claiming a row pushes next_attempt_at out by a lease instead of flagging it,
+# so rows claimed by a worker that crashes mid-send become due again on their own.
+CLAIM_QUERY = """UPDATE TOP (?) dbo.hotel_guest_notification_outbox WITH (ROWLOCK, READPAST)
+SET attempts = attempts + 1,
+    next_attempt_at = DATEADD(SECOND, ?, SYSUTCDATETIME())
+OUTPUT inserted.id, inserted.channel, inserted.payload, inserted.attempts
+WHERE status = 'Pending' AND next_attempt_at <= SYSUTCDATETIME()"""
+
+MARK_DELIVERED_QUERY = """UPDATE dbo.hotel_guest_notification_outbox
+SET status = 'Delivered', delivered_at = SYSUTCDATETIME(), last_error = NULL
+WHERE id = ?"""
+
+MARK_FAILED_QUERY = """UPDATE dbo.hotel_guest_notification_outbox
+SET status = ?, last_error = ?, next_attempt_at = DATEADD(SECOND, ?, SYSUTCDATETIME())
+WHERE id = ?"""
+
+SENDERS = {
+    "whatsapp": send_whatsapp_notification,
+    "sms": send_sms_notification,
+}
+
+
+def enqueue_notifications(cursor, notification_data, hotel_code=None):
+    """
+    Writes the outbox rows for per-room notifications. WhatsApp rooms are merged into one
+    message per guest and booking (see consolidate_notifications); SMS stays per room.
+
+    Uses the caller's cursor so the rows commit or roll back together with the OTP records.
+    """
+    rows = [
+        (hotel_code, channel, json.dumps(notification))
+        for channel in NOTIFICATION_CHANNELS
+        for notification in (consolidate_notifications(notification_data) if channel == "whatsapp"
+                             else notification_data)
+    ]
+    if not rows:
+        return
+    cursor.fast_executemany = True
+    cursor.executemany(ENQUEUE_QUERY, rows)
+    logging.info(f"Queued {len(rows)} notifications for {len(notification_data)} rooms in the outbox.")
+
+
+def _retry_delay(attempts):
+    """Exponential backoff in seconds for a message that has failed `attempts` times."""
+    base_delay = int(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "30"))
+    max_delay = int(os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", "1800"))
+    return min(max_delay, base_delay * 2 ** max(0, attempts - 1))
+
+
+def _send(message):
+    """Sends one claimed outbox message and returns (id, attempts, error or None)."""
+    message_id, channel, payload, attempts = message
+    sender = SENDERS.get(channel)
+    if sender is None:
+        return message_id, attempts, f"Unknown channel: {channel}"
+    try:
+        result = sender(payload)
+    except Exception as e:
+        logging.exception("Sending outbox message %s raised.", message_id)
+        return message_id, attempts, str(e)
+    if result.get("status") == "success":
+        return message_id, attempts, None
+    return message_id, attempts, json.dumps(result)[:1000]
+
+
+def dispatch_outbox(batch_size=None, max_workers=None):
+    """
+    Claims a batch of due outbox messages, sends them concurrently and records the outcome.
+
+    Failed messages are retried with exponential backoff until NOTIFICATION_MAX_ATTEMPTS,
+    after which they are marked 'Failed'.
+
+    Returns:
+        dict: Counts of claimed, delivered, retrying and failed messages.
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv("NOTIFICATION_DISPATCH_BATCH_SIZE", "100"))
+    if max_workers is None:
+        max_workers = int(os.getenv("NOTIFICATION_DISPATCH_WORKERS", "8"))
+    max_attempts = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+    lease_seconds = int(os.getenv("NOTIFICATION_CLAIM_LEASE_SECONDS", "300"))
+    summary = {"claimed": 0, "delivered": 0, "retrying": 0, "failed": 0}
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CLAIM_QUERY, (batch_size, lease_seconds))
+        messages = [tuple(row) for row in cursor.fetchall()]
+        conn.commit()
+        summary["claimed"] = len(messages)
+        if not messages:
+            return summary
+
+        logging.info(f"Dispatching {len(messages)} outbox messages.")
+        with stage_timer("outbox.send_batch", messages=len(messages)), \
+                ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(messages))),
+                                   thread_name_prefix="notification-outbox") as executor:
+            results = list(executor.map(_send, messages))
+
+        delivered = []
+        failed = []
+        for message_id, attempts, error in results:
+            if error is None:
+                delivered.append((message_id,))
+                summary["delivered"] += 1
+            elif attempts >= max_attempts:
+                failed.append(("Failed", error, 0, message_id))
+                summary["failed"] += 1
+            else:
+                failed.append(("Pending", error, _retry_delay(attempts), message_id))
+                summary["retrying"] += 1
+
+        if delivered:
+            cursor.executemany(MARK_DELIVERED_QUERY, delivered)
+        if failed:
+            cursor.executemany(MARK_FAILED_QUERY, failed)
+        conn.commit()
+
+    logging.info(f"Outbox dispatch finished: {summary}")
+    return summary
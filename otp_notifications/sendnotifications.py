@@ -1,19 +1,20 @@
 import json
 import os
-import requests
 import logging
-from urllib.parse import quote_plus
+from shared_utils.http_client import vendor_request
+from shared_utils.log_utils import cap, log_event
+from shared_utils.scheduler import PRIORITY_NOTIFICATION
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+WHATSAPP_TEMPLATE = "ezee_reservation_room_details"
+
 def send_whatsapp_notification(body):
     """Sends a WhatsApp notification using a predefined template."""
     try:
-        logging.info("Starting WhatsApp notification process.")
         # Parse the input JSON body
         data = json.loads(body)
-        logging.debug(f"Parsed input body: {data}")
 
         # Ensure required fields are present in the input
         required_fields = ["phoneNumber", "bodyValues"]
@@ -33,12 +34,11 @@ def send_whatsapp_notification(body):
             "phoneNumber": data["phoneNumber"],
             "type": "Template",
             "template": {
-                "name": "ezee_reservation_room_details",
+                "name": data.get("template") or WHATSAPP_TEMPLATE,
                 "languageCode": "en",
                 "bodyValues": data["bodyValues"]
             }
         })
-        logging.debug(f"Constructed payload: {payload}")
 
         # Headers for the API request
         headers = {
@@ -47,17 +47,16 @@ def send_whatsapp_notification(body):
         }
 
         # Send the request
-        response = requests.post(endpoint, headers=headers, data=payload)
-        logging.info(f"WhatsApp API response: {response.status_code}, {response.text}")
+        response = vendor_request("whatsapp", "POST", endpoint, stage="send_template",
+                                  priority=PRIORITY_NOTIFICATION, headers=headers, data=payload)
+        log_event("whatsapp.response", level=logging.DEBUG, status_code=response.status_code, response=response.text)
 
         # Log and handle the response
         if response.status_code == 201:
-            logging.info("WhatsApp message sent successfully.")
             return {"status": "success", "message": "WhatsApp message sent successfully."}
         else:
-            logging.error(
-                f"Failed to send WhatsApp message. Status Code: {response.status_code}, Response: {response.text}"
-            )
+            logging.error("Failed to send WhatsApp message. Status Code: %s, Response: %s",
+                          response.status_code, cap(response.text))
             return {
                 "status": "error",
                 "status_code": response.status_code,
@@ -77,13 +76,39 @@ def send_whatsapp_notification(body):
         logging.exception("An unexpected error occurred.")
         return {"status": "error", "message": f"An unexpected error occurred: {str(e)}"}
 
+def sms_variables_values(body_values):
+    """Builds the variables_values of DLT template 177711 from notification bodyValues."""
+    otp, room_number = body_values[3], body_values[2]
+    return f"{otp} & Room No - {room_number}|"
+
+def build_sms_payload(phone_number, variables_values):
+    """Builds a Fast2SMS bulkV2 DLT payload for one number."""
+    return {
+        "route" : "dlt",
+        "sender_id" : "DISRST",
+        "message" : "177711",
+        "variables_values" : variables_values,
+        "schedule_time" : "",
+        "flash" : 0,
+        "numbers" : f"{phone_number}"
+    }
+
+def post_sms_payload(payload):
+    """Posts a bulkV2 payload to Fast2SMS and returns the response."""
+    headers = {
+        'authorization': os.getenv("SMS_API_KEY"),
+        "Content-Type":"application/json",
+        'Cache-Control': "no-cache",
+    }
+    url = os.getenv("SMS_ENDPOINT", "https://www.fast2sms.com/dev/bulkV2")
+    return vendor_request("fast2sms", "POST", url, stage="bulkV2", priority=PRIORITY_NOTIFICATION,
+                          data=json.dumps(payload), headers=headers)
+
 def send_sms_notification(body):
     """Sends an SMS notification with dynamic content."""
     try:
-        logging.info("Starting SMS notification process.")
         # Parse the input JSON body
         data = json.loads(body)
-        logging.debug(f"Parsed input body: {data}")
 
         # Extract dynamic values from the body
         phone_number = data.get('phoneNumber', '9768927169')
@@ -91,61 +116,18 @@ def send_sms_notification(body):
         if len(body_values) < 6:
             raise ValueError("Insufficient body values provided for SMS content.")
 
-        # Extract values for message construction
-        guest_name, reservation_number, room_number, otp, otp_start_date_time, otp_end_date_time = body_values
-
-        # Construct the message content
-        message = f"""
-Room Lock Details
-Hello {guest_name},
-
-We are excited to welcome you!
-Here are the details for your stay:
-
-- Reservation Number - {reservation_number}
-- Room Number - {room_number}
-- OTP to Unlock - {otp}
-- OTP Validity - From {otp_start_date_time} to {otp_end_date_time}
-
-Feel free to reach out if you need any assistance. Have a pleasant stay.
-
-*Best regards,
-Discover Resorts*
-"""
-        logging.debug(f"Constructed SMS message: {message}")
-
-        # URL encode the message
-        encoded_message = quote_plus(message)
-        # payload = f"message={encoded_message}&language=english&route=q&numbers={phone_number}"
-        payload={
-        "route" : "dlt",
-        "sender_id" : "DISRST",
-        "message" : "177711",
-        "variables_values" : f"{otp} & Room No - {room_number}|",
-        "schedule_time" : "",
-        "flash" : 0,
-        "numbers" : f"{phone_number}"
-        }
-        logging.info(payload)
-
-        headers = {
-            'authorization': os.getenv("SMS_API_KEY"),
-            "Content-Type":"application/json",
-            'Cache-Control': "no-cache",
-        }
+        payload = build_sms_payload(phone_number, sms_variables_values(body_values))
+        log_event("sms.payload", level=logging.DEBUG, payload=payload)
 
         # Send the POST request
-        url = "https://www.fast2sms.com/dev/bulkV2"
-        response = requests.post(url, data=json.dumps(payload), headers=headers)
-        logging.info(f"SMS API response: {response.status_code}, {response.text}")
+        response = post_sms_payload(payload)
+        log_event("sms.response", level=logging.DEBUG, status_code=response.status_code, response=response.text)
 
         if response.status_code == 200:
-            logging.info("SMS sent successfully.")
             return {"status": "success", "message": "SMS sent successfully."}
         else:
-            logging.error(
-                f"Failed to send SMS. Status Code: {response.status_code}, Response: {response.text}"
-            )
+            logging.error("Failed to send SMS. Status Code: %s, Response: %s",
+                          response.status_code, cap(response.text))
             return {
                 "status": "error",
                 "status_code": response.status_code,
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from shared_utils.metrics import stage_timer
+from shared_utils.resilience import call_with_resilience
+from shared_utils.scheduler import PRIORITY_DEFAULT, get_scheduler
+
+# Module-level sessions survive warm invocations of the function host, so the
+# keep-alive connections in each vendor's pool are reused across requests.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _vendor_setting(vendor, name, default):
+    """Reads HTTP_<NAME>_<VENDOR>, falling back to HTTP_<NAME> and then the default."""
+    return os.getenv(f"HTTP_{name}_{vendor.upper()}", os.getenv(f"HTTP_{name}", default))
+
+
+def get_vendor_timeout(vendor):
+    """Returns the (connect, read) timeout tuple configured for a vendor."""
+    connect_timeout = float(_vendor_setting(vendor, "CONNECT_TIMEOUT", "5"))
+    read_timeout = float(_vendor_setting(vendor, "READ_TIMEOUT", "15"))
+    return (connect_timeout, read_timeout)
+
+
+def get_session(vendor):
+    """Returns the shared keep-alive session for a vendor, creating it on first use."""
+    session = _sessions.get(vendor)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(vendor)
+        if session is None:
+            pool_size = int(_vendor_setting(vendor, "POOL_SIZE", "10"))
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[vendor] = session
+            logging.info(f"Created HTTP session for {vendor} with pool size {pool_size}.")
+        return session
+
+
+def _retry_after_seconds(response):
+    """Returns a 429's Retry-After header in seconds, if it is given as a number."""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def vendor_request(vendor, method, url, stage=None, idempotent=None, priority=PRIORITY_DEFAULT, **kwargs):
+    """
+    Sends a request through the vendor's pooled session.
+
+    The call runs under the vendor's resilience policy (deadline, retries, circuit breaker
+    and optional hedging; see shared_utils.resilience). Every attempt first waits for a slot
+    from the vendor's scheduler (rate limit, adaptive concurrency and priority queue; see
+    shared_utils.scheduler). Each attempt is timed as "<vendor>.<stage>" (or just the vendor)
+    together with its status code.
+    """
+    connect_timeout, read_timeout = kwargs.pop("timeout", None) or get_vendor_timeout(vendor)
+    label = f"{vendor}.{stage}" if stage else vendor
+    scheduler = get_scheduler(vendor)
+
+    def send(remaining):
+        deadline = time.monotonic() + remaining
+        with scheduler.slot(priority, timeout=remaining) as outcome:
+            # No single attempt may outlive the call's overall deadline, queueing included.
+            remaining = max(0.001, deadline - time.monotonic())
+            timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+            with stage_timer(label) as span:
+                response = get_session(vendor).request(method, url, timeout=timeout, **kwargs)
+                span["status_code"] = response.status_code
+            outcome["status_code"] = response.status_code
+            if response.status_code == 429:
+                outcome["retry_after"] = _retry_after_seconds(response)
+            return response
+
+    return call_with_resilience(vendor, stage, method, send, idempotent)
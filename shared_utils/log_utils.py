@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import random
+import logging
+import threading
+
+REDACTED = "[REDACTED]"
+
+# Dict keys whose values are never logged: credentials, PINs and guest contact details.
+SENSITIVE_KEY_PATTERN = re.compile(
+    r"token|authorization|api[-_]?key|secret|password|otp|pin\b|mobile|phone|numbers|bodyvalues|variables_values",
+    re.IGNORECASE,
+)
+_BEARER_PATTERN = re.compile(r"(Bearer\s+)[A-Za-z0-9._~+/=-]+", re.IGNORECASE)
+_KEYED_SECRET_PATTERN = re.compile(
+    r"""((?:access_token|token|authorization|x-api-key|api_key|otp|pin|variables_values)["']?\s*[:=]\s*["']?)([^"',\s}\]]+)""",
+    re.IGNORECASE,
+)
+# Indian mobile numbers, with or without the country code.
+_PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+?91[\s-]?)?[6-9]\d{5}(\d{4})(?!\d)")
+
+_sample_rates = {}
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _max_field_chars():
+    return int(os.getenv("LOG_MAX_FIELD_CHARS", "512"))
+
+
+def _max_message_chars():
+    return int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4096"))
+
+
+def redact_text(text):
+    """Masks bearer tokens, keyed secrets and OTPs, and all but the last 4 digits of phone numbers."""
+    text = _BEARER_PATTERN.sub(r"\1" + REDACTED, text)
+    text = _KEYED_SECRET_PATTERN.sub(r"\1" + REDACTED, text)
+    return _PHONE_PATTERN.sub(r"******\1", text)
+
+
+def redact(value):
+    """Returns a copy of a payload with sensitive keys and values masked."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if value[key] is not None and SENSITIVE_KEY_PATTERN.search(str(key)) else redact(value[key])
+            for key in value
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+def cap(text, limit=None):
+    """Truncates text to `limit` characters (LOG_MAX_FIELD_CHARS by default), noting what was cut."""
+    text = str(text)
+    limit = _max_field_chars() if limit is None else limit
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+def loggable(value):
+    """Redacts and size-caps a value for logging; containers become capped JSON."""
+    if isinstance(value, (dict, list, tuple)):
+        return cap(json.dumps(redact(value), default=str))
+    if isinstance(value, str):
+        return cap(redact_text(value))
+    return value
+
+
+def should_sample(route, default=None):
+    """
+    Decides whether to log a routine event for a route, at LOG_SAMPLE_RATE_<ROUTE>, falling
+    back to `default` and then to LOG_SAMPLE_RATE (default 1).
+    """
+    rate = _sample_rates.get(route)
+    if rate is None:
+        rate = _sample_rates[route] = float(
+            os.getenv(f"LOG_SAMPLE_RATE_{route.upper()}", default or os.getenv("LOG_SAMPLE_RATE", "1"))
+        )
+    return rate >= 1 or random.random() < rate
+
+
+class _Fields:
+    """Formats structured fields only if the record is actually emitted."""
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return " ".join(f"{name}={value}" for name, value in self.fields.items())
+
+
+def log_event(event, level=logging.INFO, sample=None, logger=None, **fields):
+    """
+    Logs a structured event with redacted, size-capped fields.
+
+    Nothing is formatted when the level is disabled or the event is sampled out. The fields
+    are also attached as Application Insights custom dimensions.
+
+    Parameters:
+        event (str): Dotted event name, e.g. "hotel_guest_otp.request".
+        level (int): Logging level.
+        sample (str): Route whose LOG_SAMPLE_RATE applies; None logs every event.
+        logger (logging.Logger): Defaults to the root logger.
+        fields: Event fields, redacted and capped before logging.
+    """
+    logger = logger or logging.getLogger()
+    if not logger.isEnabledFor(level) or (sample and not should_sample(sample)):
+        return
+    fields = {name: loggable(value) for name, value in fields.items()}
+    logger.log(level, "%s %s", event, _Fields(fields), extra={"custom_dimensions": dict(fields, event=event)})
+
+
+class RedactingFilter(logging.Filter):
+    """Redacts and caps every record's message before any handler formats it."""
+
+    def filter(self, record):
+        # Always store the formatted message, so later filters and handlers never apply
+        # record.args to it a second time.
+        record.msg, record.args = cap(redact_text(record.getMessage()), _max_message_chars()), None
+        return True
+
+
+def install_log_redaction():
+    """Adds the RedactingFilter to the root logger, which the app's modules log through."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            logging.getLogger().addFilter(RedactingFilter())
+            _installed = True
@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from shared_utils.log_utils import should_sample
+from shared_utils.telemetry import TELEMETRY_LOGGER, record_histogram
+
+# Durations are kept per stage in a bounded window, so the histogram reflects recent traffic.
+_windows = {}
+_status_counts = {}
+_totals = Counter()
+_events = Counter()
+_gauges = {}
+_lock = threading.Lock()
+_metrics_logger = logging.getLogger(f"{TELEMETRY_LOGGER}.metrics")
+# Attributes of LogRecord itself, which `extra` fields must not overwrite.
+_RESERVED_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def _window_size():
+    return int(os.getenv("METRICS_WINDOW_SIZE", "1024"))
+
+
+def record_stage(stage, duration_ms, status="ok", status_code=None, **dimensions):
+    """
+    Records one stage duration, exports it as a metric and emits a structured trace.
+
+    Every stage is recorded on the "stage.duration" histogram (dimensions stage, status and
+    status_code), which Application Insights receives as a custom metric once
+    configure_telemetry() has run. Failed stages and 4xx/5xx vendor responses are always
+    traced; successful ones are sampled at LOG_SAMPLE_RATE_METRICS (default 0.1).
+
+    Parameters:
+        stage (str): Dotted stage name, e.g. "atomberg.get_lock_dynamic_pin".
+        duration_ms (float): Wall time of the stage in milliseconds.
+        status (str): "ok" or "error".
+        status_code (int): Vendor HTTP status code, when the stage is a vendor call.
+        dimensions: Extra custom dimensions such as a room count.
+    """
+    with _lock:
+        window = _windows.get(stage)
+        if window is None:
+            window = _windows[stage] = deque(maxlen=_window_size())
+            _status_counts[stage] = Counter()
+        window.append(duration_ms)
+        _totals[stage] += 1
+        _status_counts[stage][str(status_code) if status_code is not None else status] += 1
+
+    attributes = {"stage": stage, "status": status}
+    if status_code is not None:
+        attributes["status_code"] = status_code
+    record_histogram("stage.duration", duration_ms, **attributes)
+
+    failed = status != "ok" or (status_code is not None and status_code >= 400)
+    if not _metrics_logger.isEnabledFor(logging.INFO) or not (failed or should_sample("metrics", default="0.1")):
+        return
+    # Flat `extra` fields become custom dimensions of the exported trace.
+    attributes["duration_ms"] = round(duration_ms, 2)
+    attributes.update((name, value) for name, value in dimensions.items() if name not in _RESERVED_RECORD_FIELDS)
+    _metrics_logger.info("stage %s took %.1f ms", stage, duration_ms, extra=attributes)
+
+
+@contextmanager
+def stage_timer(stage, **dimensions):
+    """
+    Times the enclosed block as `stage`.
+
+    Yields a dict the block can fill in: set "status_code" for vendor calls or add
+    dimensions. The stage is recorded as an error if the block raises.
+    """
+    span = {"status": "ok"}
+    started = time.perf_counter()
+    try:
+        yield span
+    except Exception:
+        span["status"] = "error"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        status = span.pop("status")
+        status_code = span.pop("status_code", None)
+        record_stage(stage, duration_ms, status, status_code, **dimensions, **span)
+
+
+def increment(event, amount=1):
+    """Counts an event such as a retry or a rejected call."""
+    with _lock:
+        _events[event] += amount
+
+
+def set_gauge(name, value):
+    """Records the current value of a gauge such as a circuit breaker state."""
+    with _lock:
+        _gauges[name] = value
+
+
+def get_counters_snapshot():
+    """Returns the event counters and gauges."""
+    with _lock:
+        return {"events": dict(sorted(_events.items())), "gauges": dict(sorted(_gauges.items()))}
+
+
+def _percentile(ordered, fraction):
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 2)
+
+
+def get_metrics_snapshot():
+    """Returns count, latency percentiles and status breakdown per stage."""
+    with _lock:
+        windows = {stage: sorted(window) for stage, window in _windows.items()}
+        status_counts = {stage: dict(counts) for stage, counts in _status_counts.items()}
+        totals = dict(_totals)
+
+    snapshot = {}
+    for stage, ordered in sorted(windows.items()):
+        snapshot[stage] = {
+            "count": totals[stage],
+            "window": len(ordered),
+            "p50_ms": _percentile(ordered, 0.50),
+            "p95_ms": _percentile(ordered, 0.95),
+            "p99_ms": _percentile(ordered, 0.99),
+            "max_ms": round(ordered[-1], 2),
+            "statuses": status_counts[stage],
+        }
+    return snapshot
@@ -0,0 +1,239 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from shared_utils.metrics import increment, set_gauge
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without calling the vendor while its circuit breaker is open."""
+
+
+class DeadlineExceededError(requests.exceptions.Timeout):
+    """Raised when a call's overall deadline runs out before a usable response."""
+
+
+class CallPolicy:
+    """Deadline, retry and hedging settings for one vendor endpoint."""
+
+    def __init__(self, deadline, retries, backoff_base, backoff_max, hedge_after):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+
+
+def _setting(name, vendor, stage, default):
+    """Reads HTTP_<NAME>_<VENDOR>_<STAGE>, then HTTP_<NAME>_<VENDOR>, then HTTP_<NAME>."""
+    names = [f"HTTP_{name}_{vendor.upper()}", f"HTTP_{name}"]
+    if stage:
+        names.insert(0, f"HTTP_{name}_{vendor.upper()}_{stage.upper()}")
+    for env_name in names:
+        value = os.getenv(env_name)
+        if value is not None:
+            return value
+    return default
+
+
+def get_call_policy(vendor, stage=None):
+    """Builds the CallPolicy configured for a vendor endpoint."""
+    return CallPolicy(
+        deadline=float(_setting("DEADLINE_SECONDS", vendor, stage, "20")),
+        retries=int(_setting("RETRIES", vendor, stage, "2")),
+        backoff_base=float(_setting("BACKOFF_BASE_SECONDS", vendor, stage, "0.2")),
+        backoff_max=float(_setting("BACKOFF_MAX_SECONDS", vendor, stage, "2")),
+        hedge_after=float(_setting("HEDGE_AFTER_SECONDS", vendor, stage, "0")),
+    )
+
+
+class CircuitBreaker:
+    """
+    Fails fast for a vendor after repeated failures.
+
+    Closed: calls pass through. After `failure_threshold` consecutive failures the breaker
+    opens and rejects calls for `reset_timeout` seconds, then lets a single trial call
+    through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        set_gauge(f"circuit.{name}", self._state)
+
+    @property
+    def state(self):
+        return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not reach the vendor."""
+        with self._lock:
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    increment(f"circuit.{self.name}.rejected")
+                    raise CircuitOpenError(f"{self.name} circuit is open; failing fast.")
+                self._set_state("half_open")
+            if self._state == "half_open":
+                if self._trial_in_flight:
+                    increment(f"circuit.{self.name}.rejected")
+                    raise CircuitOpenError(f"{self.name} circuit is half-open; trial call in flight.")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != "closed":
+                self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release_trial(self):
+        """Ends a half-open trial call without counting it as a success or a failure."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _set_state(self, state):
+        if state != self._state:
+            logging.warning(f"Circuit breaker for {self.name} changed from {self._state} to {state}.")
+        self._state = state
+        set_gauge(f"circuit.{self.name}", state)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HTTP_HEDGE_WORKERS", "16")),
+                                     thread_name_prefix="vendor-hedge")
+
+
+def get_circuit_breaker(vendor):
+    """Returns the process-wide circuit breaker of a vendor."""
+    breaker = _breakers.get(vendor)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(vendor)
+            if breaker is None:
+                breaker = _breakers[vendor] = CircuitBreaker(
+                    vendor,
+                    failure_threshold=int(os.getenv(f"CIRCUIT_FAILURE_THRESHOLD_{vendor.upper()}",
+                                                    os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))),
+                    reset_timeout=float(os.getenv(f"CIRCUIT_RESET_SECONDS_{vendor.upper()}",
+                                                  os.getenv("CIRCUIT_RESET_SECONDS", "30"))),
+                )
+    return breaker
+
+
+def _is_vendor_failure(response):
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def _hedged(send, policy, label):
+    """Runs send(); if it has not finished after hedge_after seconds, races a second copy."""
+    first = _hedge_executor.submit(send)
+    done, _ = wait([first], timeout=policy.hedge_after)
+    if done:
+        return first.result()
+
+    increment(f"hedge.{label}")
+    second = _hedge_executor.submit(send)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if not _is_vendor_failure(response) or not pending:
+                return response
+            error = None
+    raise error
+
+
+def call_with_resilience(vendor, stage, method, send, idempotent=None):
+    """
+    Calls a vendor with a deadline, jittered exponential retries and its circuit breaker.
+
+    Parameters:
+        vendor (str): Vendor name; one circuit breaker per vendor.
+        stage (str): Endpoint name used for per-endpoint settings and metrics.
+        method (str): HTTP method; GET/HEAD/OPTIONS/PUT/DELETE are treated as idempotent.
+        send (callable): send(timeout_seconds) performs one attempt and returns the response.
+        idempotent (bool): Overrides the method-based idempotency.
+
+    Non-idempotent calls are only retried when the vendor cannot have acted on them
+    (connect timeouts and 429s). Hedging applies to idempotent calls only.
+    """
+    policy = get_call_policy(vendor, stage)
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    breaker = get_circuit_breaker(vendor)
+    label = f"{vendor}.{stage}" if stage else vendor
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            increment(f"deadline_exceeded.{label}")
+            raise DeadlineExceededError(f"{label} exceeded its {policy.deadline} second deadline.")
+        breaker.before_call()
+
+        response = None
+        error = None
+        try:
+            if idempotent and policy.hedge_after > 0 and policy.hedge_after < remaining:
+                response = _hedged(lambda: send(remaining), policy, label)
+            else:
+                response = send(remaining)
+        except requests.exceptions.ConnectTimeout as e:
+            error, retryable = e, True
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            error, retryable = e, idempotent
+        except Exception:
+            breaker.release_trial()  # Not a vendor health signal (e.g. a bad request payload).
+            raise
+
+        if response is not None:
+            if not _is_vendor_failure(response):
+                breaker.record_success()
+                return response
+            retryable = idempotent or response.status_code == 429
+        breaker.record_failure()
+
+        backoff = min(policy.backoff_max, policy.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if not retryable or attempt >= policy.retries or time.monotonic() + backoff >= deadline:
+            if error is not None:
+                raise error
+            return response
+
+        attempt += 1
+        increment(f"retry.{label}")
+        logging.warning(f"Retrying {label} (attempt {attempt + 1}) in {backoff:.2f} seconds after "
+                        f"{error or response.status_code}.")
+        time.sleep(backoff)
+
+
+def get_circuit_states():
+    """Returns the current state of every vendor circuit breaker."""
+    with _breakers_lock:
+        return {vendor: breaker.state for vendor, breaker in _breakers.items()}
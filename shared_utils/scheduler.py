@@ -0,0 +1,204 @@
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from shared_utils.metrics import increment, record_stage, set_gauge
+
+# Lower values are admitted first when calls to the same vendor queue up.
+PRIORITY_CRITICAL = 0       # Access tokens other calls are waiting on.
+PRIORITY_PIN = 10           # Lock PINs for guests checking in now.
+PRIORITY_DEFAULT = 50
+PRIORITY_BACKGROUND = 80    # Pre-generation, lock list refreshes, revocations.
+PRIORITY_NOTIFICATION = 100
+
+# Multiplicative decreases are applied at most this often, so one burst of 429s from
+# calls already in flight halves the limit once rather than collapsing it to the minimum.
+DECREASE_INTERVAL_SECONDS = 1.0
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a call waits longer than its deadline for a vendor slot."""
+
+
+def _setting(name, vendor, default):
+    """Reads <NAME>_<VENDOR>, falling back to <NAME> and then the default."""
+    return os.getenv(f"{name}_{vendor.upper()}", os.getenv(name, default))
+
+
+class VendorScheduler:
+    """
+    Admits calls to one vendor under a token bucket and an adaptive concurrency limit.
+
+    The bucket allows `rate` calls per second with bursts of up to `burst` (rate 0 disables
+    it). The concurrency limit follows AIMD: it grows by 1/limit per fast success and halves
+    on a 429, a call slower than `latency_target` or a transport error, between
+    `min_concurrency` and `max_concurrency`. A 429's Retry-After pauses admissions.
+    Waiting calls are admitted in priority order, then first come first served.
+    """
+
+    def __init__(self, vendor, rate=0, burst=None, min_concurrency=1, max_concurrency=10, latency_target=5):
+        self.vendor = vendor
+        self._rate = rate
+        self._burst = max(1.0, burst if burst is not None else rate)
+        self._tokens = self._burst
+        self._refilled_at = time.monotonic()
+        self._min_concurrency = max(1, min_concurrency)
+        self._max_concurrency = max(self._min_concurrency, max_concurrency)
+        self._limit = float(self._max_concurrency)
+        self._latency_target = latency_target
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {"admitted": 0, "throttled": 0, "queue_timeouts": 0, "decreases": 0, "max_wait_ms": 0.0}
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_DEFAULT, timeout=None):
+        """
+        Holds one admission for the enclosed call.
+
+        The block may set "status_code" (and "retry_after") on the yielded dict; an exception
+        counts as a congestion signal.
+        """
+        self.acquire(priority, timeout)
+        outcome = {}
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            self.release(None, time.monotonic() - started, error=True)
+            raise
+        self.release(outcome.get("status_code"), time.monotonic() - started, outcome.get("retry_after"))
+
+    def acquire(self, priority=PRIORITY_DEFAULT, timeout=None):
+        """Waits until the call may start; raises QueueTimeoutError after `timeout` seconds."""
+        enqueued_at = time.monotonic()
+        deadline = enqueued_at + timeout if timeout is not None else None
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait_for = self._admission_wait(ticket, now)
+                    if wait_for == 0:
+                        break
+                    if deadline is not None:
+                        if now >= deadline:
+                            self._stats["queue_timeouts"] += 1
+                            increment(f"queue_timeout.{self.vendor}")
+                            raise QueueTimeoutError(
+                                f"No {self.vendor} slot became available within {timeout:.1f} seconds."
+                            )
+                        wait_for = min(wait_for or deadline - now, deadline - now)
+                    self._condition.wait(wait_for)
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            if self._rate > 0:
+                self._tokens -= 1
+            waited_ms = (time.monotonic() - enqueued_at) * 1000
+            self._stats["admitted"] += 1
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+            # The next caller in line may be admissible too.
+            self._condition.notify_all()
+        record_stage(f"queue.{self.vendor}", waited_ms, priority=priority)
+
+    def release(self, status_code, latency, retry_after=None, error=False):
+        """Ends a call and adapts the concurrency limit to how it went."""
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if status_code == 429:
+                self._stats["throttled"] += 1
+                increment(f"throttled.{self.vendor}")
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + min(float(retry_after), 60.0))
+            if error or status_code == 429 or (self._latency_target > 0 and latency > self._latency_target):
+                if now - self._last_decrease >= DECREASE_INTERVAL_SECONDS:
+                    self._last_decrease = now
+                    self._limit = max(float(self._min_concurrency), self._limit / 2)
+                    self._stats["decreases"] += 1
+                    logging.warning(f"Reducing {self.vendor} concurrency to {int(self._limit)} "
+                                    f"(status {status_code}, {latency:.2f} s).")
+                    set_gauge(f"concurrency_limit.{self.vendor}", int(self._limit))
+            elif status_code is not None and status_code < 500:
+                previous = int(self._limit)
+                self._limit = min(float(self._max_concurrency), self._limit + 1 / self._limit)
+                if int(self._limit) != previous:
+                    set_gauge(f"concurrency_limit.{self.vendor}", int(self._limit))
+            self._condition.notify_all()
+
+    def stats(self):
+        """Returns queue depth by priority, in-flight calls, the current limit and wait counters."""
+        with self._condition:
+            self._refill(time.monotonic())
+            queued = {}
+            for priority, _ in self._queue:
+                queued[priority] = queued.get(priority, 0) + 1
+            return dict(
+                self._stats,
+                max_wait_ms=round(self._stats["max_wait_ms"], 2),
+                queued=sum(queued.values()),
+                queued_by_priority=queued,
+                in_flight=self._in_flight,
+                concurrency_limit=int(self._limit),
+                tokens=round(self._tokens, 2) if self._rate > 0 else None,
+                paused_seconds=round(max(0.0, self._paused_until - time.monotonic()), 2),
+            )
+
+    def _refill(self, now):
+        if self._rate > 0:
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+
+    def _admission_wait(self, ticket, now):
+        """Returns 0 if the ticket may start now, else how long to wait (None: until notified)."""
+        if self._queue[0] != ticket or self._in_flight >= int(self._limit):
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._rate > 0 and self._tokens < 1:
+            return (1 - self._tokens) / self._rate
+        return 0
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(vendor):
+    """Returns the process-wide scheduler of a vendor, configured from RATE_LIMIT_* settings."""
+    scheduler = _schedulers.get(vendor)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(vendor)
+            if scheduler is None:
+                burst = _setting("RATE_LIMIT_BURST", vendor, "")
+                scheduler = _schedulers[vendor] = VendorScheduler(
+                    vendor,
+                    rate=float(_setting("RATE_LIMIT_PER_SECOND", vendor, "0")),
+                    burst=float(burst) if burst else None,
+                    min_concurrency=int(_setting("RATE_LIMIT_MIN_CONCURRENCY", vendor, "1")),
+                    max_concurrency=int(_setting("RATE_LIMIT_MAX_CONCURRENCY", vendor, "10")),
+                    latency_target=float(_setting("RATE_LIMIT_LATENCY_TARGET_SECONDS", vendor, "5")),
+                )
+    return scheduler
+
+
+def get_scheduler_stats():
+    """Returns the queue statistics of every vendor scheduler."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return {scheduler.vendor: scheduler.stats() for scheduler in schedulers}
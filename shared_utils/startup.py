@@ -0,0 +1,130 @@
+import sys
+import time
+import logging
+import importlib
+import threading
+from contextlib import contextmanager
+
+# Heavy third-party modules are imported one by one ahead of each subsystem, so the
+# startup report attributes their cost separately from the subsystem's own modules.
+SUBSYSTEM_DEPENDENCIES = {
+    "crud_operations.hotel_guest_otp": ("pyodbc", "requests", "pytz"),
+    "crud_operations.db_connection": ("pyodbc",),
+    "crud_operations.pregeneration": ("pyodbc", "requests", "pytz"),
+    "crud_operations.otp_export": ("pyodbc", "requests", "pytz"),
+    "crud_operations.otp_stats": ("pyodbc", "requests", "pytz"),
+    "atomberg_locks.lock_functions": ("requests",),
+    "otp_notifications.sendnotifications": ("requests",),
+    "otp_notifications.outbox": ("pyodbc", "requests"),
+}
+
+_process_started = time.perf_counter()
+_import_timings = {}
+_init_timings = {}
+_warm_up_started = False
+_lock = threading.Lock()
+
+
+def _timed_import(module_name):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    duration_ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        _import_timings.setdefault(module_name, round(duration_ms, 2))
+    logging.info(f"Imported {module_name} in {duration_ms:.1f} ms.")
+    return module
+
+
+def lazy_import(module_name):
+    """
+    Imports a subsystem on first use and records how long it and its heavy dependencies took.
+
+    Later calls return the already-imported module at the cost of a dict lookup.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    for dependency in SUBSYSTEM_DEPENDENCIES.get(module_name, ()):
+        _timed_import(dependency)
+    return _timed_import(module_name)
+
+
+@contextmanager
+def timed_init(step):
+    """Records the duration and outcome of an initialization step for the startup report."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = f"error: {e}"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        with _lock:
+            _init_timings[step] = {"duration_ms": round(duration_ms, 2), "outcome": outcome}
+
+
+def warm_up():
+    """
+    Pre-opens a pooled SQL connection, fetches the Atomberg token and fills the lock-list cache.
+
+    Each step is attempted independently; failures are logged and reported, not raised.
+    """
+    steps = (
+        ("sql_connection", _warm_sql_connection),
+        ("atomberg_token", _warm_atomberg_token),
+        ("atomberg_lock_list", _warm_lock_list),
+    )
+    for step, function in steps:
+        try:
+            with timed_init(step):
+                function()
+        except Exception:
+            logging.exception(f"Warm-up step {step} failed.")
+    return get_startup_report()
+
+
+def start_background_warm_up():
+    """Runs warm_up() on a daemon thread, once per process; returns False if it already ran."""
+    global _warm_up_started
+    with _lock:
+        if _warm_up_started:
+            return False
+        _warm_up_started = True
+    threading.Thread(target=warm_up, name="instance-warm-up", daemon=True).start()
+    return True
+
+
+def _warm_sql_connection():
+    db_connection = lazy_import("crud_operations.db_connection")
+    with db_connection.get_db_connection() as conn:
+        conn.cursor().execute("SELECT 1").fetchone()
+
+
+def _warm_atomberg_token():
+    lock_functions = lazy_import("atomberg_locks.lock_functions")
+    if not lock_functions.get_atomberg_connection():
+        raise RuntimeError("No Atomberg access token.")
+
+
+def _warm_lock_list():
+    lock_functions = lazy_import("atomberg_locks.lock_functions")
+    failed = [hotel_code for hotel_code, loaded in lock_functions.warm_lock_registry().items() if not loaded]
+    if failed:
+        raise RuntimeError(f"Lock lists could not be fetched for: {', '.join(failed)}")
+
+
+def get_startup_report():
+    """Returns per-module import costs and per-step initialization costs for this process."""
+    with _lock:
+        imports = dict(sorted(_import_timings.items(), key=lambda item: -item[1]))
+        init = dict(_init_timings)
+    return {
+        "process_uptime_seconds": round(time.perf_counter() - _process_started, 1),
+        "imports_ms": imports,
+        "total_import_ms": round(sum(imports.values()), 2),
+        "initialization": init,
+    }
@@ -0,0 +1,50 @@
+import os
+import logging
+import threading
+
+# Loggers under this name are exported to Application Insights with their `extra` fields as
+# custom dimensions (see configure_telemetry). Stage traces log through "telemetry.metrics".
+TELEMETRY_LOGGER = "telemetry"
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError:
+    otel_metrics = None
+
+_configured = False
+_configure_lock = threading.Lock()
+_histograms = {}
+
+
+def configure_telemetry():
+    """
+    Exports telemetry logs and metrics to Application Insights through azure-monitor-opentelemetry.
+
+    Only the "telemetry" logger tree is exported, since the Functions host already forwards
+    the app's other log records. Does nothing (and returns False) when
+    APPLICATIONINSIGHTS_CONNECTION_STRING is unset or the package is not installed.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return True
+        if not os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING"):
+            return False
+        try:
+            from azure.monitor.opentelemetry import configure_azure_monitor
+        except ImportError:
+            logging.warning("azure-monitor-opentelemetry is not installed; stage metrics stay in-process.")
+            return False
+        configure_azure_monitor(logger_name=TELEMETRY_LOGGER)
+        _configured = True
+    return True
+
+
+def record_histogram(name, value, unit="ms", **attributes):
+    """Records a value on an OpenTelemetry histogram; a no-op without opentelemetry."""
+    if otel_metrics is None:
+        return
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = otel_metrics.get_meter(TELEMETRY_LOGGER).create_histogram(name, unit=unit)
+    histogram.record(value, attributes)
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import pytz
+
+# Timezone objects are built once per process instead of on every conversion.
+UTC = timezone.utc
+IST = pytz.timezone("Asia/Kolkata")
+
+SQL_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+DISPLAY_DATETIME_FORMAT = "%d %b %Y, %I:%M %p"
+
+# Shifts applied to the PMS arrival/departure times. The PMS sends Asia/Kolkata wall-clock
+# times; these windows were calibrated against the UTC Functions host, so the wall-clock
+# value is read as UTC and shifted (i.e. 30 minutes before arrival and after departure in IST).
+WINDOW_OFFSETS = {
+    "default": timedelta(0),
+    "checkin": timedelta(hours=-6),
+    "checkout": timedelta(hours=-5),
+}
+
+
+@lru_cache(maxsize=4096)
+def pms_time_to_epoch(date_str, time_str, operation="default"):
+    """
+    Converts a PMS date ('YYYY-MM-DD') and time ('HH:MM:SS') to the epoch used for the lock window.
+
+    The result does not depend on the host timezone. Many rooms share the same arrival and
+    departure times, so results are memoized.
+    """
+    offset = WINDOW_OFFSETS.get(operation)
+    if offset is None:
+        raise ValueError("Invalid operation. Use 'checkin', 'checkout', or 'default'.")
+    combined_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
+    return int((combined_datetime + offset).replace(tzinfo=UTC).timestamp())
+
+
+@lru_cache(maxsize=4096)
+def epoch_to_sql_datetime(epoch):
+    """Formats an epoch as the 'YYYY-MM-DDTHH:MM:SS' UTC string stored in hotel_guest_otp_record."""
+    return datetime.fromtimestamp(int(epoch), UTC).strftime(SQL_DATETIME_FORMAT)
+
+
+@lru_cache(maxsize=4096)
+def epoch_to_display(epoch):
+    """Formats an epoch as the Asia/Kolkata time shown to guests, e.g. '10 Jan 2030, 01:30 PM'."""
+    return datetime.fromtimestamp(int(epoch), UTC)\
+        .astimezone(IST)\
+        .strftime(DISPLAY_DATETIME_FORMAT)\
+        .replace("pm", "p.m.").replace("am", "a.m.")
+
+
+@lru_cache(maxsize=4096)
+def sql_datetime_to_display(datetime_str):
+    """Formats a stored UTC 'YYYY-MM-DDTHH:MM:SS' string as the Asia/Kolkata display time."""
+    parsed = datetime.strptime(datetime_str[:19], SQL_DATETIME_FORMAT).replace(tzinfo=UTC)
+    return epoch_to_display(int(parsed.timestamp()))
+
+
+def convert_otp_windows(otp_objects):
+    """
+    Converts the validity windows of a batch of Atomberg OTP objects in one call.
+
+    Parameters:
+        otp_objects (list): Dicts with validStartTime and validEndTime epochs.
+
+    Returns:
+        list: (start_sql, end_sql, start_display, end_display) tuples in input order.
+    """
+    return [
+        (
+            epoch_to_sql_datetime(otp_object["validStartTime"]),
+            epoch_to_sql_datetime(otp_object["validEndTime"]),
+            epoch_to_display(otp_object["validStartTime"]),
+            epoch_to_display(otp_object["validEndTime"]),
+        )
+        for otp_object in otp_objects
+    ]
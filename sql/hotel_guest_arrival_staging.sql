@@ -0,0 +1,29 @@
+-- Upcoming arrivals pushed through the upcoming_arrivals route. The
+-- pregenerate_arrival_otps timer function generates their lock PINs ahead of
+-- check-in and stores them in hotel_guest_otp_record as 'Pre-generated'.
+CREATE TABLE dbo.hotel_guest_arrival_staging (
+    id BIGINT IDENTITY(1, 1) NOT NULL PRIMARY KEY,
+    hotel_code NVARCHAR(50) NOT NULL,
+    guest_name NVARCHAR(200) NULL,
+    guest_mobile_number NVARCHAR(20) NULL,
+    guest_email NVARCHAR(200) NULL,
+    reservation_number NVARCHAR(100) NOT NULL,
+    room_no NVARCHAR(50) NOT NULL,
+    room_name NVARCHAR(100) NULL,
+    check_in_epoch BIGINT NOT NULL,           -- lock window start, as produced by time_to_epoch(..., "checkin")
+    check_out_epoch BIGINT NOT NULL,          -- lock window end, as produced by time_to_epoch(..., "checkout")
+    status NVARCHAR(20) NOT NULL
+        CONSTRAINT DF_hotel_guest_arrival_staging_status DEFAULT 'Pending',  -- Pending | Pre-generated | Failed
+    attempts INT NOT NULL
+        CONSTRAINT DF_hotel_guest_arrival_staging_attempts DEFAULT 0,
+    next_attempt_at DATETIME2 NOT NULL
+        CONSTRAINT DF_hotel_guest_arrival_staging_next_attempt DEFAULT SYSUTCDATETIME(),
+    created_at DATETIME2 NOT NULL
+        CONSTRAINT DF_hotel_guest_arrival_staging_created DEFAULT SYSUTCDATETIME(),
+    processed_at DATETIME2 NULL,
+    CONSTRAINT UQ_hotel_guest_arrival_staging_room
+        UNIQUE (hotel_code, reservation_number, room_no, check_in_epoch, check_out_epoch)
+);
+
+CREATE NONCLUSTERED INDEX IX_hotel_guest_arrival_staging_due
+    ON dbo.hotel_guest_arrival_staging (status, check_in_epoch, next_attempt_at);
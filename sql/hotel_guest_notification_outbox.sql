@@ -0,0 +1,23 @@
+-- Guest notifications written in the same transaction as the OTP records and
+-- drained by the dispatch_notification_outbox timer function.
+-- One row per channel, so WhatsApp and SMS are delivered and retried independently.
+CREATE TABLE dbo.hotel_guest_notification_outbox (
+    id BIGINT IDENTITY(1, 1) NOT NULL PRIMARY KEY,
+    hotel_code NVARCHAR(50) NULL,
+    channel NVARCHAR(20) NOT NULL,            -- whatsapp | sms
+    payload NVARCHAR(MAX) NOT NULL,           -- {"phoneNumber": ..., "bodyValues": [...]}
+    status NVARCHAR(20) NOT NULL
+        CONSTRAINT DF_hotel_guest_notification_outbox_status DEFAULT 'Pending',  -- Pending | Delivered | Failed
+    attempts INT NOT NULL
+        CONSTRAINT DF_hotel_guest_notification_outbox_attempts DEFAULT 0,
+    last_error NVARCHAR(1000) NULL,
+    next_attempt_at DATETIME2 NOT NULL
+        CONSTRAINT DF_hotel_guest_notification_outbox_next_attempt DEFAULT SYSUTCDATETIME(),
+    created_at DATETIME2 NOT NULL
+        CONSTRAINT DF_hotel_guest_notification_outbox_created DEFAULT SYSUTCDATETIME(),
+    delivered_at DATETIME2 NULL
+);
+
+CREATE NONCLUSTERED INDEX IX_hotel_guest_notification_outbox_pending
+    ON dbo.hotel_guest_notification_outbox (status, next_attempt_at)
+    INCLUDE (channel, attempts);
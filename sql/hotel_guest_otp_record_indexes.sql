@@ -0,0 +1,16 @@
+-- Supports the GET filters on hotel_guest_otp_record and the keyset
+-- pagination on (check_in_date_time, id).
+CREATE NONCLUSTERED INDEX IX_hotel_guest_otp_record_hotel_check_in
+    ON dbo.hotel_guest_otp_record (hotel_code, check_in_date_time, id);
+
+CREATE NONCLUSTERED INDEX IX_hotel_guest_otp_record_check_in
+    ON dbo.hotel_guest_otp_record (check_in_date_time, id);
+
+CREATE NONCLUSTERED INDEX IX_hotel_guest_otp_record_reservation
+    ON dbo.hotel_guest_otp_record (reservation_number, check_in_date_time, id);
+
+-- Idempotency lookup for check-in retries.
+CREATE NONCLUSTERED INDEX IX_hotel_guest_otp_record_idempotency
+    ON dbo.hotel_guest_otp_record (hotel_code, reservation_number, room_no)
+    INCLUDE (check_in_date_time, check_out_date_time, generated_otp,
+             otp_start_date_time, otp_end_date_time, otp_status);